@@ -1,108 +1,73 @@
 import streamlit as st
 import sqlite3
 import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
-import re
-from reportlab.platypus import SimpleDocTemplate, Table, Paragraph
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib import colors
-import io
 from datetime import datetime
+import analytics
+import cache
+import charts
+import cnics
+import db
+import frames
+import fulltext
+import grid
+import importer
+import jobs
+import kpis
+import migrations
+import writer
+from layouts import MANAGEMENT
 
 # ================= CONFIG =================
 st.set_page_config(page_title="Hospital Management System", page_icon="🏥", layout="wide")
-sns.set_theme(style="whitegrid")
 
 # ================= DATABASE =================
 DB = "hospital.db"
 
-def init_db():
-    conn = sqlite3.connect(DB)
-    c = conn.cursor()
-    c.executescript("""
-        CREATE TABLE IF NOT EXISTS Patients(
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT,
-            cnic TEXT UNIQUE,
-            phone TEXT
-        );
-        CREATE TABLE IF NOT EXISTS Departments(
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT UNIQUE
-        );
-        CREATE TABLE IF NOT EXISTS Doctors(
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT,
-            cnic TEXT UNIQUE,
-            department TEXT
-        );
-        CREATE TABLE IF NOT EXISTS Appointments(
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            patient TEXT,
-            patient_cnic TEXT,
-            doctor TEXT,
-            doctor_cnic TEXT,
-            date TEXT,
-            time TEXT,
-            status TEXT
-        );
-        CREATE TABLE IF NOT EXISTS Billings(
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            patient TEXT,
-            patient_cnic TEXT,
-            amount REAL,
-            details TEXT,
-            status TEXT
-        );
-    """)
-    # Default departments
-    c.execute("INSERT OR IGNORE INTO Departments(name) VALUES ('Cardiology'),('Neurology'),('Orthopedics')")
-    conn.commit()
-    conn.close()
-
-init_db()
+migrations.ensure(DB, MANAGEMENT)
 
 # ================= HELPERS =================
+@cache.cached_read(DB)
 def query(sql, params=()):
-    conn = sqlite3.connect(DB)
-    df = pd.read_sql(sql, conn, params=params)
-    conn.close()
-    return df
+    return frames.load(db.connection(DB), sql, MANAGEMENT, params)
 
 def execute(sql, params=()):
-    conn = sqlite3.connect(DB)
-    conn.execute(sql, params)
-    conn.commit()
-    conn.close()
+    return writer.get_writer(DB).execute(sql, params)
 
 def valid_cnic(cnic):
-    return re.match(r"^\d{5}-\d{7}-\d$", cnic)
+    return cnics.is_valid(cnic)
 
 def safe_rerun():
     st.session_state["refresh_needed"] = True
 
 if "refresh_needed" in st.session_state and st.session_state["refresh_needed"]:
     st.session_state["refresh_needed"] = False
-    st.experimental_rerun()
-
-def export_pdf(df, title="Report", filename="report.pdf"):
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
-    styles = getSampleStyleSheet()
-    elements = [Paragraph(title, styles["Title"])]
-    data = [df.columns.tolist()] + df.values.tolist()
-    table = Table(data)
-    table.setStyle([
-        ('BACKGROUND', (0,0), (-1,0), colors.HexColor("#1E88E5")),
-        ('TEXTCOLOR',(0,0),(-1,0),colors.white),
-        ('GRID', (0,0), (-1,-1), 1, colors.black)
-    ])
-    elements.append(table)
-    doc.build(elements)
-    buffer.seek(0)
-    return buffer
+    st.rerun()
+
+# ================= CHARTS =================
+TOP_DOCTORS = 15  # the rest are drawn as one "Other" bar
+
+@cache.cached_read(DB, tables=lambda: {"Appointments"})
+def monthly_trend_chart():
+    monthly = analytics.readers(DB, MANAGEMENT).appointments_by_month()
+    if monthly.empty:
+        return None
+    monthly["date"] = pd.to_datetime(monthly["month"])
+    sns = charts.seaborn()
+
+    def draw(ax):
+        sns.lineplot(data=monthly, x="date", y="Appointments", marker="o", ax=ax)
+        ax.set_title("📈 Monthly Appointment Trend")
+    return charts.render(draw)
+
+@cache.cached_read(DB, tables=lambda: {"Appointments"})
+def doctor_chart():
+    per_doctor = analytics.readers(DB, MANAGEMENT).appointments_by_doctor(top=TOP_DOCTORS)
+    sns = charts.seaborn()
+
+    def draw(ax):
+        sns.barplot(data=per_doctor, x="Appointments", y="doctor", hue="doctor", palette="viridis", legend=False, ax=ax)
+        ax.set_title("👨‍⚕️ Doctor-wise Appointments")
+    return charts.render(draw)
 
 # ================= SIDEBAR =================
 menu = st.sidebar.selectbox(
@@ -113,46 +78,36 @@ menu = st.sidebar.selectbox(
 # ================= DASHBOARD =================
 if menu == "Dashboard":
     st.title("🏥 Hospital Management Dashboard")
-    total_patients = len(query("SELECT * FROM Patients"))
-    total_doctors = len(query("SELECT * FROM Doctors"))
-    total_appointments = len(query("SELECT * FROM Appointments"))
-    total_revenue = query("SELECT SUM(amount) as revenue FROM Billings")["revenue"].iloc[0] or 0
+    totals = kpis.dashboard_kpis(db.connection(DB))
     col1, col2, col3, col4 = st.columns(4)
-    col1.metric("👥 Patients", total_patients)
-    col2.metric("👨‍⚕️ Doctors", total_doctors)
-    col3.metric("🗓️ Appointments", total_appointments)
-    col4.metric("💰 Revenue", f"${total_revenue:.2f}")
-
-    # Monthly Appointment Trend
-    appt = query("SELECT * FROM Appointments")
-    if not appt.empty:
-        appt["date"] = pd.to_datetime(appt["date"])
-        monthly = appt.groupby(appt["date"].dt.to_period("M")).size().reset_index(name="Appointments")
-        monthly["date"] = monthly["date"].dt.to_timestamp()
-        fig, ax = plt.subplots()
-        sns.lineplot(data=monthly, x="date", y="Appointments", marker="o", ax=ax)
-        ax.set_title("📈 Monthly Appointment Trend")
-        st.pyplot(fig)
+    col1.metric("👥 Patients", totals.patients)
+    col2.metric("👨‍⚕️ Doctors", totals.doctors)
+    col3.metric("🗓️ Appointments", totals.appointments)
+    col4.metric("💰 Revenue", f"${totals.revenue:.2f}")
 
-        # Doctor-wise Appointments
-        fig2, ax2 = plt.subplots()
-        sns.countplot(data=appt, y="doctor", palette="viridis", ax=ax2)
-        ax2.set_title("👨‍⚕️ Doctor-wise Appointments")
-        st.pyplot(fig2)
+    # Charts are cached PNGs; matplotlib only runs after Appointments change.
+    trend = monthly_trend_chart()
+    if trend is not None:
+        st.image(trend, use_container_width=True)
+        st.image(doctor_chart(), use_container_width=True)
 
 # ================= PATIENTS =================
 elif menu == "Patients":
     st.header("👥 Patients Management")
     search = st.text_input("🔍 Search by CNIC or Name", key="search_patient")
-    df_pat = query("SELECT * FROM Patients WHERE cnic LIKE ? OR name LIKE ?" if search else "SELECT * FROM Patients",
-                   (f"%{search}%", f"%{search}%") if search else ())
-    st.dataframe(df_pat)
+    if search:
+        st.dataframe(fulltext.search(db.connection(DB), MANAGEMENT, "Patients", search, columns=("cnic", "name")))
+    else:
+        grid.data_grid(db.connection(DB), "Patients", "id", key="patients", sort_columns=["name", "cnic"])
+
+    with st.expander("📥 Bulk Import Patients"):
+        importer.import_widget(DB, MANAGEMENT, "Patients", key="import_patients")
 
     col1, col2 = st.columns(2)
     with col1:
         st.subheader("➕ Add Patient")
         pname = st.text_input("Name", key="add_pat_name")
-        pcnic = st.text_input("CNIC (xxxxx-xxxxxxx-x)", key="add_pat_cnic")
+        pcnic = cnics.normalize(st.text_input("CNIC (xxxxx-xxxxxxx-x)", key="add_pat_cnic"))
         pphone = st.text_input("Phone", key="add_pat_phone")
         if st.button("Add Patient", key="btn_add_patient"):
             if not valid_cnic(pcnic):
@@ -171,7 +126,7 @@ elif menu == "Patients":
         pat_row = query("SELECT * FROM Patients WHERE id=?", (pid,))
         if not pat_row.empty:
             pname = st.text_input("Name", pat_row["name"].iloc[0], key="upd_pat_name")
-            pcnic = st.text_input("CNIC", pat_row["cnic"].iloc[0], key="upd_pat_cnic")
+            pcnic = cnics.normalize(st.text_input("CNIC", pat_row["cnic"].iloc[0], key="upd_pat_cnic"))
             pphone = st.text_input("Phone", pat_row["phone"].iloc[0], key="upd_pat_phone")
             ucol, dcol = st.columns(2)
             with ucol:
@@ -190,16 +145,21 @@ elif menu == "Patients":
 elif menu == "Doctors":
     st.header("👨‍⚕️ Doctors Management")
     search = st.text_input("🔍 Search by CNIC or Name", key="search_doc")
-    df_doc = query("SELECT * FROM Doctors WHERE cnic LIKE ? OR name LIKE ?" if search else "SELECT * FROM Doctors",
-                   (f"%{search}%", f"%{search}%") if search else ())
-    st.dataframe(df_doc)
+    if search:
+        st.dataframe(fulltext.search(db.connection(DB), MANAGEMENT, "Doctors", search, columns=("cnic", "name")))
+    else:
+        grid.data_grid(db.connection(DB), "Doctors", "id", key="doctors",
+                       sort_columns=["name", "department"], filter_columns=["department"])
+
+    with st.expander("📥 Bulk Import Doctors"):
+        importer.import_widget(DB, MANAGEMENT, "Doctors", key="import_doctors")
 
     col1, col2 = st.columns(2)
     departments = query("SELECT name FROM Departments")["name"].tolist()
     with col1:
         st.subheader("➕ Add Doctor")
         dname = st.text_input("Name", key="add_doc_name")
-        dcnic = st.text_input("CNIC", key="add_doc_cnic")
+        dcnic = cnics.normalize(st.text_input("CNIC", key="add_doc_cnic"))
         ddept = st.selectbox("Department", departments, key="add_doc_dept")
         if st.button("Add Doctor", key="btn_add_doc"):
             if valid_cnic(dcnic):
@@ -218,7 +178,7 @@ elif menu == "Doctors":
         doc_row = query("SELECT * FROM Doctors WHERE id=?", (did,))
         if not doc_row.empty:
             dname = st.text_input("Name", doc_row["name"].iloc[0], key="upd_doc_name")
-            dcnic = st.text_input("CNIC", doc_row["cnic"].iloc[0], key="upd_doc_cnic")
+            dcnic = cnics.normalize(st.text_input("CNIC", doc_row["cnic"].iloc[0], key="upd_doc_cnic"))
             ddept = st.selectbox("Department", departments, index=departments.index(doc_row["department"].iloc[0]), key="upd_doc_dept")
             ucol, dcol = st.columns(2)
             with ucol:
@@ -233,6 +193,16 @@ elif menu == "Doctors":
                     st.success("❌ Doctor deleted")
                     safe_rerun()
 
+# ================= REPORTS =================
+elif menu == "Reports":
+    st.title("📄 Reports")
+    st.caption("Reports render in the background; download them below when ready.")
+    report_table = st.selectbox("Table", ["Patients", "Doctors", "Appointments", "Billings"], key="report_table")
+    if st.button("Generate PDF", key="btn_report"):
+        jobs.request(DB, "report_jobs", "table", {"table": report_table, "title": f"{report_table} Report"},
+                     f"{report_table.lower()}_report.pdf")
+    jobs.jobs_panel(DB, "report_jobs")
+
 # ================= Footer =================
 st.markdown("---")
 st.markdown("<center>Built with ❤️ using Streamlit • Database: hospital.db</center>", unsafe_allow_html=True)
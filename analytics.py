@@ -0,0 +1,297 @@
+"""Optional DuckDB engine for the dashboard aggregations.
+
+DuckDB attaches ``hospital.db`` read-only through its sqlite extension and
+runs the aggregations vectorized, on all cores.  Two modes:
+
+``attach``
+    every query scans the SQLite tables directly; nothing is copied.
+``sync``
+    Patients, Appointments and Billings are copied once into DuckDB's
+    columnar storage (in memory, or the file named by
+    ``HOSPITAL_ANALYTICS_STORE``), with the date columns typed as DATE,
+    and kept current from ``ChangeLog`` (see changes.py): rows changed
+    since the last query are deleted and re-read by primary key.  A
+    query with no new log entries reads only the columnar copy.
+
+The engine is opt-in with ``HOSPITAL_ANALYTICS=duckdb`` (or
+``duckdb-attach``) and needs ``pip install duckdb``; without network
+access to DuckDB's extension repository, also
+``pip install duckdb-extension-sqlite-scanner``.  The dashboards of all
+three apps get their aggregations from readers(): the enabled Engine, or
+else the rollups.py readers, whose namesakes return the same shapes.
+
+    python analytics.py --db hospital.db --layout charts
+"""
+import argparse
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+import pandas as pd
+
+import changes
+import db
+import rollups
+from layouts import LAYOUTS
+
+MODES = {"duckdb": "sync", "duckdb-attach": "attach"}
+SYNCED_TABLES = ("Patients", "Appointments", "Billings")
+AGE_BINS = [0, 18, 35, 50, 65, 120]
+AGE_GROUPS = ["0-18", "19-35", "36-50", "51-65", "65+"]
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def _duckdb():
+    try:
+        import duckdb
+    except ImportError:
+        raise ImportError("the DuckDB analytics engine needs duckdb: pip install duckdb") from None
+    return duckdb
+
+
+def _connect(store):
+    duckdb = _duckdb()
+    conn = duckdb.connect(store or ":memory:")
+    try:
+        import duckdb_extension_sqlite_scanner as bundled
+    except ImportError:
+        return conn  # ATTACH downloads the extension on first use
+    path = os.path.join(os.path.dirname(bundled.__file__), "extensions",
+                        f"v{duckdb.__version__}", "sqlite_scanner.duckdb_extension")
+    if os.path.exists(path):
+        conn.execute(f"LOAD '{path}'")
+    return conn
+
+
+class Engine:
+    def __init__(self, db_path, layout, mode="sync", store=None):
+        if mode not in MODES.values():
+            raise ValueError(f"unknown analytics mode {mode!r}; expected one of {sorted(MODES.values())}")
+        self.db_path = db_path
+        self.layout = layout
+        self.mode = mode
+        self.tables = [table for table in SYNCED_TABLES if layout.has(table)]
+        self._db = _connect(store)
+        self._db.execute(f"ATTACH '{os.path.abspath(db_path)}' AS src (TYPE sqlite, READ_ONLY)")
+        self._src = "src." if mode == "attach" else ""
+        self._lock = threading.Lock()
+        self.watermark = None
+        if mode == "sync":
+            self._db.execute("CREATE TABLE IF NOT EXISTS SyncState(watermark BIGINT)")
+            row = self._db.execute("SELECT MAX(watermark) FROM SyncState").fetchone()
+            self.watermark = row[0]
+
+    # ---- sync ----
+    def _select(self, table, source):
+        """SELECT of every column of ``source``, with the table's date column typed as DATE."""
+        date = {"Appointments": self.layout.appointment_date, "Billings": self.layout.billing_date}.get(table)
+        if date is None:
+            return f"SELECT * FROM {source}"
+        return f"SELECT * REPLACE (TRY_CAST({date} AS DATE) AS {date}) FROM {source}"
+
+    def _copy(self, table):
+        self._db.execute(f"CREATE OR REPLACE TABLE {table} AS {self._select(table, f'src.{table}')}")
+
+    def _apply(self, conn, table, row_ids):
+        pk = self.layout.primary_keys[table]
+        ids = pd.DataFrame({"id": list(row_ids)})
+        current = pd.read_sql(
+            f"SELECT * FROM {table} WHERE {pk} IN (SELECT value FROM json_each(?))",
+            conn, params=(json.dumps(list(row_ids)),),
+        )
+        self._db.register("changed_ids", ids)
+        self._db.register("changed_rows", current)
+        try:
+            self._db.execute(f"DELETE FROM {table} WHERE {pk} IN (SELECT id FROM changed_ids)")
+            if not current.empty:
+                self._db.execute(f"INSERT INTO {table} {self._select(table, 'changed_rows')}")
+        finally:
+            self._db.unregister("changed_ids")
+            self._db.unregister("changed_rows")
+
+    def _save(self, watermark):
+        self.watermark = watermark
+        self._db.execute("DELETE FROM SyncState")
+        self._db.execute("INSERT INTO SyncState VALUES (?)", (watermark,))
+
+    def refresh(self):
+        """Bring the columnar copies up to date with the SQLite file (sync mode)."""
+        if self.mode != "sync":
+            return
+        conn = db.connection(self.db_path)
+        with self._lock:
+            # Copies and replays are idempotent, so the log position is read
+            # first and anything written meanwhile is simply applied again.
+            ok, top = changes.replayable(conn, self.watermark)
+            if not ok:
+                for table in self.tables:
+                    self._copy(table)
+                self._save(top)
+                return
+            if top <= self.watermark:
+                return
+            changed = {}
+            for seq, table, _, row_id, _ in changes.changes_since(conn, self.watermark):
+                changed.setdefault(table, set()).add(row_id)
+                top = max(top, seq)
+            for table in self.tables:
+                row_ids = changed.get(table)
+                if not row_ids:
+                    continue
+                rows = self._db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                if len(row_ids) > changes.REBUILD_SHARE * max(rows, 1):
+                    self._copy(table)
+                else:
+                    self._apply(conn, table, row_ids)
+            self._save(top)
+
+    def query(self, sql, params=()):
+        """DataFrame of ``sql`` run by DuckDB; ``{src}`` names the tables' schema."""
+        self.refresh()
+        return self._db.cursor().execute(sql.format(src=self._src), params).df()
+
+    # ---- readers ----
+    def _by_month(self, table, column, value, where="", params=()):
+        # Grouped on the truncated date; only the group keys are formatted.
+        month = f"date_trunc('month', TRY_CAST({column} AS DATE))"
+        where = where or f" WHERE {month} IS NOT NULL"
+        return self.query(
+            f"SELECT strftime(month, '%Y-%m') AS month, value FROM ("
+            f"SELECT {month} AS month, {value} AS value FROM {{src}}{table}{where} GROUP BY 1"
+            f") ORDER BY month",
+            params,
+        )
+
+    def status_counts(self):
+        return self.query(
+            "SELECT status, COUNT(*) AS Count FROM {src}Appointments "
+            "WHERE status IS NOT NULL AND status <> '' GROUP BY status ORDER BY Count DESC"
+        ).set_index("status")
+
+    def monthly_revenue(self):
+        if self.layout.billing_date is None or not self.layout.has("Billings"):
+            return pd.DataFrame({"amount": pd.Series(dtype=float)}, index=pd.Index([], name="month"))
+        revenue = self._by_month("Billings", self.layout.billing_date, "SUM(COALESCE(amount, 0))")
+        return revenue.rename(columns={"value": "amount"}).set_index("month")
+
+    def _appointments_where(self, year=None, doctor=None):
+        date, where, params = self.layout.appointment_date, [], []
+        where.append(f"TRY_CAST({date} AS DATE) IS NOT NULL")
+        if year is not None:
+            where.append(f"TRY_CAST({date} AS DATE) BETWEEN CAST(? AS DATE) AND CAST(? AS DATE)")
+            params += [f"{int(year):04d}-01-01", f"{int(year):04d}-12-31"]
+        if doctor is not None:
+            where.append(f"{self.layout.appointment_doctor} = ?")
+            params.append(doctor)
+        return " WHERE " + " AND ".join(where), params
+
+    def appointment_years(self):
+        date = f"TRY_CAST({self.layout.appointment_date} AS DATE)"
+        years = self.query(f"SELECT DISTINCT year({date}) AS year FROM {{src}}Appointments "
+                           f"WHERE {date} IS NOT NULL ORDER BY 1")
+        return [int(year) for year in years["year"]]
+
+    def appointments_by_month(self, year=None, doctor=None):
+        where, params = self._appointments_where(year, doctor)
+        monthly = self._by_month("Appointments", self.layout.appointment_date, "COUNT(*)", where, params)
+        return monthly.rename(columns={"value": "Appointments"})
+
+    def appointments_by_doctor(self, year=None, top=None):
+        doctor = self.layout.appointment_doctor
+        where, params = self._appointments_where(year) if year is not None else ("", [])
+        per_doctor = f"SELECT {doctor} AS doctor, COUNT(*) AS n FROM {{src}}Appointments{where} GROUP BY 1"
+        if top is None:
+            frame = self.query(f"SELECT doctor, n AS Appointments FROM ({per_doctor}) ORDER BY n DESC", params)
+        else:
+            frame = self.query(f"""
+                WITH ranked AS (
+                    SELECT doctor, n, LEAST(ROW_NUMBER() OVER (ORDER BY n DESC, doctor), ? + 1) AS bucket
+                    FROM ({per_doctor})
+                )
+                SELECT ANY_VALUE(doctor) AS doctor, SUM(n) AS Appointments, bucket
+                FROM ranked
+                GROUP BY bucket
+                ORDER BY bucket
+            """, [int(top)] + params)
+            # Labelled here so the doctors keep their own type (doc_id ints, names).
+            frame["doctor"] = frame["doctor"].where(frame.pop("bucket") <= int(top), "Other")
+        frame["Appointments"] = frame["Appointments"].astype("int64")
+        return frame
+
+    def patients_by_age(self):
+        """Patients per age group (graphs.py schema), a Series indexed by AGE_GROUPS."""
+        cases = " ".join(
+            f"WHEN age > {low} AND age <= {high} THEN '{label}'"
+            for low, high, label in zip(AGE_BINS, AGE_BINS[1:], AGE_GROUPS)
+        )
+        counts = self.query(
+            f"SELECT CASE {cases} END AS age, COUNT(*) AS count FROM {{src}}Patients GROUP BY 1"
+        ).dropna().set_index("age")["count"]
+        return counts.reindex(AGE_GROUPS, fill_value=0).astype("int64")
+
+    def close(self):
+        self._db.close()
+
+
+def engine(db_path, layout, mode=None):
+    """The shared Engine for ``db_path``, or None unless $HOSPITAL_ANALYTICS enables one."""
+    if mode is None:
+        setting = os.environ.get("HOSPITAL_ANALYTICS", "")
+        if setting in ("", "sqlite"):
+            return None
+        if setting not in MODES:
+            raise ValueError(f"unknown HOSPITAL_ANALYTICS {setting!r}; expected sqlite or one of {sorted(MODES)}")
+        mode = MODES[setting]
+    key = (os.path.abspath(db_path), layout.name, mode)
+    with _engines_lock:
+        if key not in _engines:
+            _engines[key] = Engine(db_path, layout, mode, os.environ.get("HOSPITAL_ANALYTICS_STORE"))
+        return _engines[key]
+
+
+class _Rollups:
+    """rollups.py's readers on one connection, called like Engine's."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return functools.partial(getattr(rollups, name), self._conn)
+
+
+def readers(db_path, layout):
+    """The enabled Engine for ``db_path``, or the rollups.py readers on its pooled connection."""
+    eng = engine(db_path, layout)
+    return eng if eng is not None else _Rollups(db.connection(db_path))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the dashboard aggregations on DuckDB.")
+    parser.add_argument("--db", default="hospital.db")
+    parser.add_argument("--layout", choices=sorted(LAYOUTS), default="management")
+    parser.add_argument("--mode", choices=sorted(MODES.values()), default="sync")
+    parser.add_argument("--store", help="DuckDB file for the synced copies (default: in memory)")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    eng = Engine(args.db, LAYOUTS[args.layout], args.mode, args.store)
+    eng.refresh()
+    print(f"{args.mode}: ready in {time.perf_counter() - started:.2f}s")
+    names = ["status_counts", "monthly_revenue", "appointments_by_month", "appointments_by_doctor"]
+    if args.layout == "charts":
+        names.append("patients_by_age")
+    for name in names:
+        started = time.perf_counter()
+        result = getattr(eng, name)()
+        print(f"\n{name} ({time.perf_counter() - started:.3f}s)")
+        print(result.head(20).to_string())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,70 +1,35 @@
 import streamlit as st
-import sqlite3
-import pandas as pd
-import plotly.express as px
-import re
-from reportlab.platypus import SimpleDocTemplate, Paragraph
-from reportlab.lib.styles import getSampleStyleSheet
+import analytics
+import cache
+import cnics
+import db
+import frames
+import fulltext
+import grid
+import importer
+import jobs
+import migrations
+import writer
+from layouts import FRONT_DESK
 
 # ================= CONFIG =================
 st.set_page_config(page_title="Hospital System", page_icon="🏥", layout="wide")
 DB = "hospital.db"
+TOP_DOCTORS = 15  # doctor-wise chart; the rest are summed into "Other"
 
 # ================= DATABASE =================
-def init_db():
-    conn = sqlite3.connect(DB)
-    c = conn.cursor()
-    c.executescript("""
-    CREATE TABLE IF NOT EXISTS Users(
-        username TEXT PRIMARY KEY,
-        password TEXT,
-        role TEXT
-    );
-
-    CREATE TABLE IF NOT EXISTS Patients(
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT,
-        cnic TEXT UNIQUE,
-        phone TEXT
-    );
-
-    CREATE TABLE IF NOT EXISTS Doctors(
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT,
-        cnic TEXT UNIQUE,
-        specialty TEXT
-    );
-
-    CREATE TABLE IF NOT EXISTS Appointments(
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        patient TEXT,
-        doctor TEXT,
-        date TEXT,
-        time TEXT,
-        status TEXT
-    );
-    """)
-    c.execute("INSERT OR IGNORE INTO Users VALUES ('admin','admin123','Admin')")
-    conn.commit()
-    conn.close()
-
-init_db()
+migrations.ensure(DB, FRONT_DESK)
 
 # ================= HELPERS =================
+@cache.cached_read(DB)
 def query(sql, params=()):
-    conn = sqlite3.connect(DB)
-    df = pd.read_sql(sql, conn, params=params)
-    conn.close()
-    return df
+    return frames.load(db.connection(DB), sql, FRONT_DESK, params)
 
 def execute(sql, params=()):
-    conn = sqlite3.connect(DB)
-    conn.execute(sql, params)
-    conn.commit()
-    conn.close()
+    return writer.get_writer(DB).execute(sql, params)
 
 def valid_cnic(cnic):
-    return re.match(r"^\d{5}-\d{7}-\d$", cnic)
+    return cnics.is_valid(cnic)
 
 # ================= LOGIN =================
 if "login" not in st.session_state:
@@ -76,8 +41,9 @@ if not st.session_state.login:
     p = st.text_input("Password", type="password")
 
     if st.button("Login"):
-        user = query("SELECT * FROM Users WHERE username=? AND password=?", (u, p))
-        if not user.empty:
+        # Not through query(): its cache would keep the password as part of a key.
+        user = db.connection(DB).execute("SELECT 1 FROM Users WHERE username=? AND password=?", (u, p)).fetchone()
+        if user is not None:
             st.session_state.login = True
             st.rerun()
         else:
@@ -92,21 +58,24 @@ menu = st.sidebar.radio(
 
 # ================= DASHBOARD =================
 if menu == "Dashboard":
-    st.title("📊 Analytics")
+    import plotly.express as px  # loaded on the first dashboard visit, not at startup
 
-    df = query("SELECT * FROM Appointments")
-    if not df.empty:
-        df["date"] = pd.to_datetime(df["date"])
-        year = st.selectbox("Year", sorted(df["date"].dt.year.unique()))
-        df = df[df["date"].dt.year == year]
+    st.title("📊 Analytics")
 
-        monthly = df.groupby(df["date"].dt.month).size().reset_index(name="Count")
+    aggregates = analytics.readers(DB, FRONT_DESK)
+    years = aggregates.appointment_years()
+    if years:
+        year = st.selectbox("Year", years)
+        monthly = aggregates.appointments_by_month(year)
+        monthly["date"] = monthly["month"].str[5:].astype(int)
+        monthly = monthly.rename(columns={"Appointments": "Count"})
         fig = px.line(monthly, x="date", y="Count", markers=True,
                       title="Monthly Appointment Trend")
         st.plotly_chart(fig, use_container_width=True)
 
-        doc_fig = px.bar(df["doctor"].value_counts().reset_index(),
-                         x="index", y="doctor",
+        per_doctor = aggregates.appointments_by_doctor(year, top=TOP_DOCTORS)
+        doc_fig = px.bar(per_doctor,
+                         x="doctor", y="Appointments",
                          title="Doctor-wise Appointments")
         st.plotly_chart(doc_fig, use_container_width=True)
     else:
@@ -118,16 +87,17 @@ elif menu == "Patients":
 
     search = st.text_input("Search by CNIC or Name")
     if search:
-        st.dataframe(query(
-            "SELECT * FROM Patients WHERE cnic LIKE ? OR name LIKE ?",
-            (f"%{search}%", f"%{search}%")
-        ))
+        st.dataframe(fulltext.search(db.connection(DB), FRONT_DESK, "Patients", search,
+                                     columns=("cnic", "name")))
     else:
-        st.dataframe(query("SELECT * FROM Patients"))
+        grid.data_grid(db.connection(DB), "Patients", "id", key="patients", sort_columns=["name", "cnic"])
+
+    with st.expander("📥 Bulk Import"):
+        importer.import_widget(DB, FRONT_DESK, "Patients", key="import_patients")
 
     with st.form("add_patient"):
         name = st.text_input("Name")
-        cnic = st.text_input("CNIC (xxxxx-xxxxxxx-x)")
+        cnic = cnics.normalize(st.text_input("CNIC (xxxxx-xxxxxxx-x)"))
         phone = st.text_input("Phone")
         if st.form_submit_button("Add"):
             if not valid_cnic(cnic):
@@ -144,16 +114,18 @@ elif menu == "Doctors":
 
     search = st.text_input("Search by CNIC or Name")
     if search:
-        st.dataframe(query(
-            "SELECT * FROM Doctors WHERE cnic LIKE ? OR name LIKE ?",
-            (f"%{search}%", f"%{search}%")
-        ))
+        st.dataframe(fulltext.search(db.connection(DB), FRONT_DESK, "Doctors", search,
+                                     columns=("cnic", "name")))
     else:
-        st.dataframe(query("SELECT * FROM Doctors"))
+        grid.data_grid(db.connection(DB), "Doctors", "id", key="doctors",
+                       sort_columns=["name", "specialty"], filter_columns=["specialty"])
+
+    with st.expander("📥 Bulk Import"):
+        importer.import_widget(DB, FRONT_DESK, "Doctors", key="import_doctors")
 
     with st.form("add_doctor"):
         name = st.text_input("Name")
-        cnic = st.text_input("CNIC")
+        cnic = cnics.normalize(st.text_input("CNIC"))
         spec = st.text_input("Specialty")
         if st.form_submit_button("Add"):
             if not valid_cnic(cnic):
@@ -185,26 +157,33 @@ elif menu == "Appointments":
         st.success("Appointment booked")
         st.rerun()
 
-    st.dataframe(query("SELECT * FROM Appointments"))
+    grid.data_grid(db.connection(DB), "Appointments", "id", key="appointments",
+                   sort_columns=["date", "doctor", "status"],
+                   filter_columns=["patient", "doctor", "date", "status"])
+
+    with st.expander("📥 Bulk Import"):
+        importer.import_widget(DB, FRONT_DESK, "Appointments", key="import_appointments")
 
     st.subheader("🧾 PDF Slip")
     aid = st.number_input("Appointment ID", min_value=1)
 
     if st.button("Generate PDF"):
-        row = query("SELECT * FROM Appointments WHERE id=?", (aid,))
-        if row.empty:
+        import slips  # pulls in reportlab
+
+        pdf = slips.slip_pdf(db.connection(DB), aid)
+        if pdf is None:
             st.error("Invalid ID")
         else:
-            file = f"appointment_{aid}.pdf"
-            pdf = SimpleDocTemplate(file)
-            styles = getSampleStyleSheet()
-            pdf.build([
-                Paragraph("<b>Appointment Slip</b>", styles["Title"]),
-                Paragraph(f"Patient: {row.iloc[0]['patient']}", styles["Normal"]),
-                Paragraph(f"Doctor: {row.iloc[0]['doctor']}", styles["Normal"]),
-                Paragraph(f"Date: {row.iloc[0]['date']}", styles["Normal"]),
-                Paragraph(f"Time: {row.iloc[0]['time']}", styles["Normal"]),
-                Paragraph(f"Status: {row.iloc[0]['status']}", styles["Normal"])
-            ])
-            with open(file, "rb") as f:
-                st.download_button("Download PDF", f, file)
+            st.download_button("Download PDF", pdf, f"appointment_{aid}.pdf", "application/pdf")
+
+    st.subheader("🖨️ Batch Slips")
+    bcol1, bcol2, bcol3 = st.columns(3)
+    start = bcol1.date_input("From", key="batch_from")
+    end = bcol2.date_input("To", key="batch_to")
+    doctor = bcol3.selectbox("Doctor", ["All doctors"] + (doctors["name"] + " | " + doctors["cnic"]).tolist(),
+                             key="batch_doctor")
+    if st.button("Generate Slips"):
+        doctor = None if doctor == "All doctors" else doctor
+        jobs.request(DB, "slip_jobs", "slips", {"start": str(start), "end": str(end), "doctor": doctor},
+                     f"slips_{start}_{end}.pdf")
+    jobs.jobs_panel(DB, "slip_jobs")
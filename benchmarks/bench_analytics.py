@@ -0,0 +1,165 @@
+"""Time the dashboard aggregations on pandas, SQLite and DuckDB at scale.
+
+One "dashboard" is appointments per status, per month and per doctor
+(top 15), revenue per month and patients per age group, on the graphs.py
+schema.  The databases hold the given number of appointments, half as
+many bills and a tenth as many patients; they are generated once into
+``--dir`` and reused.  Paths compared:
+
+    pandas         SELECT * of each table into pandas, then groupby (the old app code)
+    sqlite         GROUP BY over the base tables
+    rollups        the trigger-maintained rollup tables (no age groups)
+    duckdb-attach  analytics.Engine scanning the SQLite file
+    duckdb-sync    analytics.Engine on its columnar copy (copy time shown separately)
+
+    python benchmarks/bench_analytics.py --rows 1000000 10000000 50000000 --dir /var/tmp/bench
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analytics  # noqa: E402
+import migrations  # noqa: E402
+import rollups  # noqa: E402
+from layouts import CHARTS  # noqa: E402
+
+TOP = 15
+
+GENERATE = """
+    WITH RECURSIVE seq(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM seq WHERE i + 1 < :n)
+    INSERT INTO Patients(name, age, gender, registration_date)
+    SELECT 'Patient ' || i, i % 97 + 1, CASE i % 2 WHEN 0 THEN 'Male' ELSE 'Female' END,
+           date('2015-01-01', '+' || (i % 3650) || ' days')
+    FROM seq WHERE i < :n / 10;
+
+    WITH RECURSIVE seq(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM seq WHERE i + 1 < :n)
+    INSERT INTO Appointments(pat_id, doc_id, app_date, app_time, status)
+    SELECT i % (:n / 10) + 1, i * 7919 % 500 + 1, date('2015-01-01', '+' || (i * 31 % 3650) || ' days'),
+           '10:00', CASE i % 3 WHEN 0 THEN 'Scheduled' WHEN 1 THEN 'Completed' ELSE 'Cancelled' END
+    FROM seq;
+
+    WITH RECURSIVE seq(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM seq WHERE i + 1 < :n)
+    INSERT INTO Billings(pat_id, amount, details, bill_date)
+    SELECT i % (:n / 10) + 1, (i % 500) * 10.0, 'consultation', date('2015-01-01', '+' || (i % 3650) || ' days')
+    FROM seq WHERE i < :n / 2;
+"""
+
+
+def build(path, rows):
+    """Create the database at ``path`` unless it already holds ``rows`` appointments."""
+    if os.path.exists(path):
+        conn = sqlite3.connect(path)
+        if conn.execute("SELECT COUNT(*) FROM Appointments").fetchone()[0] == rows:
+            return conn
+        conn.close()
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    migrations.migrate(conn, CHARTS)
+    # Bulk load without the per-row triggers, then fill the rollups in one pass.
+    triggers = [name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")]
+    for name in triggers:
+        conn.execute(f"DROP TRIGGER {name}")
+    with conn:
+        for statement in GENERATE.split(";"):
+            if statement.strip():
+                conn.execute(statement, {"n": rows})
+    rollups.rebuild(conn, CHARTS)
+    return conn
+
+
+def pandas_dashboard(conn):
+    appointments = pd.read_sql("SELECT * FROM Appointments", conn)
+    billings = pd.read_sql("SELECT * FROM Billings", conn)
+    patients = pd.read_sql("SELECT * FROM Patients", conn)
+    appointments["app_date"] = pd.to_datetime(appointments["app_date"])
+    billings["bill_date"] = pd.to_datetime(billings["bill_date"])
+    return [
+        appointments["status"].value_counts(),
+        appointments.groupby(appointments["app_date"].dt.strftime("%Y-%m")).size(),
+        appointments["doc_id"].value_counts().head(TOP),
+        billings.groupby(billings["bill_date"].dt.strftime("%Y-%m"))["amount"].sum(),
+        pd.cut(patients["age"], bins=analytics.AGE_BINS, labels=analytics.AGE_GROUPS).value_counts(),
+    ]
+
+
+def sqlite_dashboard(conn):
+    return [conn.execute(sql).fetchall() for sql in (
+        "SELECT status, COUNT(*) FROM Appointments GROUP BY status",
+        "SELECT strftime('%Y-%m', app_date), COUNT(*) FROM Appointments GROUP BY 1",
+        f"SELECT doc_id, COUNT(*) AS n FROM Appointments GROUP BY doc_id ORDER BY n DESC LIMIT {TOP}",
+        "SELECT strftime('%Y-%m', bill_date), SUM(amount) FROM Billings GROUP BY 1",
+        "SELECT age / 10, COUNT(*) FROM Patients GROUP BY 1",
+    )]
+
+
+def rollups_dashboard(conn):
+    return [
+        rollups.status_counts(conn),
+        rollups.appointments_by_month(conn),
+        rollups.appointments_by_doctor(conn, top=TOP),
+        rollups.monthly_revenue(conn),
+    ]
+
+
+def engine_dashboard(engine):
+    return [
+        engine.status_counts(),
+        engine.appointments_by_month(),
+        engine.appointments_by_doctor(top=TOP),
+        engine.monthly_revenue(),
+        engine.patients_by_age(),
+    ]
+
+
+def best(fn, runs):
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000, 10_000_000, 50_000_000])
+    parser.add_argument("--dir", default=tempfile.gettempdir(), help="where the databases are generated")
+    parser.add_argument("--runs", type=int, default=3, help="best of N dashboards")
+    parser.add_argument("--pandas-max", type=int, default=10_000_000,
+                        help="skip the pandas path above this many appointments")
+    args = parser.parse_args(argv)
+
+    print(f"{os.cpu_count()} CPUs")
+    print(f"{'appointments':>12} {'path':<14} {'setup s':>8} {'dashboard s':>12}")
+    for rows in args.rows:
+        path = os.path.join(args.dir, f"bench_analytics_{rows}.db")
+        started = time.perf_counter()
+        conn = build(path, rows)
+        print(f"{rows:>12} {'generate':<14} {time.perf_counter() - started:>8.1f} {'':>12}")
+
+        results = []
+        if rows <= args.pandas_max:
+            results.append(("pandas", 0.0, best(lambda: pandas_dashboard(conn), args.runs)))
+        results.append(("sqlite", 0.0, best(lambda: sqlite_dashboard(conn), args.runs)))
+        results.append(("rollups", 0.0, best(lambda: rollups_dashboard(conn), args.runs)))
+        for mode in ("attach", "sync"):
+            started = time.perf_counter()
+            engine = analytics.Engine(path, CHARTS, mode)
+            engine.refresh()
+            setup = time.perf_counter() - started
+            results.append((f"duckdb-{mode}", setup, best(lambda: engine_dashboard(engine), args.runs)))
+            engine.close()
+        for name, setup, seconds in results:
+            print(f"{rows:>12} {name:<14} {setup:>8.2f} {seconds:>12.3f}")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
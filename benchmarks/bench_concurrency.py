@@ -0,0 +1,106 @@
+"""Read/write throughput of concurrent sessions under each database profile.
+
+Simulates front-desk traffic: reader threads run the dashboard KPI query
+and an appointment lookup, writer threads book appointments one commit at
+a time, all on their own connections against the same file.
+
+    python benchmarks/bench_concurrency.py --seconds 5 --readers 8 --writers 4
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+import kpis  # noqa: E402
+import migrations  # noqa: E402
+from layouts import MANAGEMENT  # noqa: E402
+
+
+def _seed(path, appointments):
+    conn = sqlite3.connect(path)
+    migrations.migrate(conn, MANAGEMENT)
+    with conn:
+        conn.executemany(
+            "INSERT INTO Appointments VALUES(NULL,?,?,?,?,?,?,?)",
+            [(f"p{i}", f"{i:05d}-0000000-0", f"d{i % 40}", f"{i % 40:05d}-1111111-1",
+              f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}", "10:00", "Scheduled")
+             for i in range(appointments)],
+        )
+    conn.close()
+
+
+def _connect(path, pragmas):
+    conn = sqlite3.connect(path, timeout=0)  # rely on the profile's busy_timeout only
+    for name, value in pragmas.items():
+        conn.execute(f"PRAGMA {name}={value}")
+    return conn
+
+
+def run(profile, seconds, readers, writers, appointments):
+    pragmas = db.PROFILES[profile]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        _seed(path, appointments)
+        stop = threading.Event()
+        totals = {"reads": 0, "writes": 0, "locked": 0}
+        lock = threading.Lock()
+
+        def reader():
+            conn, done = _connect(path, pragmas), 0
+            while not stop.is_set():
+                kpis.dashboard_kpis(conn)
+                conn.execute("SELECT * FROM Appointments WHERE doctor = ? ORDER BY date LIMIT 20",
+                             (f"d{random.randrange(40)}",)).fetchall()
+                done += 1
+            with lock:
+                totals["reads"] += done
+
+        def writer():
+            conn, done, locked = _connect(path, pragmas), 0, 0
+            while not stop.is_set():
+                try:
+                    with conn:
+                        conn.execute("INSERT INTO Appointments VALUES(NULL,'w','00000-0000000-0',"
+                                     "'d1','00001-1111111-1','2024-06-01','09:00','Scheduled')")
+                    done += 1
+                except sqlite3.OperationalError:
+                    locked += 1
+            with lock:
+                totals["writes"] += done
+                totals["locked"] += locked
+
+        threads = [threading.Thread(target=reader) for _ in range(readers)]
+        threads += [threading.Thread(target=writer) for _ in range(writers)]
+        for t in threads:
+            t.start()
+        time.sleep(seconds)
+        stop.set()
+        for t in threads:
+            t.join()
+    return {k: v / seconds if k != "locked" else v for k, v in totals.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--appointments", type=int, default=50_000)
+    parser.add_argument("--profiles", nargs="+", default=sorted(db.PROFILES))
+    args = parser.parse_args(argv)
+
+    print(f"{'profile':<10} {'reads/s':>10} {'writes/s':>10} {'locked':>8}")
+    for profile in args.profiles:
+        result = run(profile, args.seconds, args.readers, args.writers, args.appointments)
+        print(f"{profile:<10} {result['reads']:>10.0f} {result['writes']:>10.0f} {result['locked']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Time and peak memory of exporting the Billings table to PDF.
+
+Compares the old approach (the whole DataFrame as one reportlab Table)
+with reports.query_pdf(), which streams rows from the cursor a page at a
+time.  The old approach is slow enough to be run on fewer rows.
+
+    python benchmarks/bench_pdf_export.py --rows 100000 --legacy-rows 5000 --memory
+"""
+import argparse
+import io
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Table
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import migrations  # noqa: E402
+import reports  # noqa: E402
+from layouts import MANAGEMENT  # noqa: E402
+
+
+def _seed(path, rows):
+    conn = sqlite3.connect(path)
+    migrations.migrate(conn, MANAGEMENT)
+    with conn:
+        conn.executemany(
+            "INSERT INTO Billings VALUES(NULL,?,?,?,?,?)",
+            [(f"Patient {i}", f"{35202 + i % 50}-{i:07d}-{i % 10}", 100 + i % 900 + 0.5,
+              f"Consultation and lab work #{i}", "Paid" if i % 3 else "Pending")
+             for i in range(rows)],
+        )
+    return conn
+
+
+def legacy(conn, rows):
+    df = pd.read_sql(f"SELECT * FROM Billings LIMIT {rows}", conn)
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    elements = [Paragraph("Billings", getSampleStyleSheet()["Title"])]
+    table = Table([df.columns.tolist()] + df.values.tolist())
+    table.setStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#1E88E5")),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ])
+    elements.append(table)
+    doc.build(elements)
+    return buffer.getbuffer().nbytes
+
+
+def streaming(conn, rows):
+    pdf = reports.query_pdf(conn, f"SELECT * FROM Billings LIMIT {rows}", title="Billings")
+    return pdf.getbuffer().nbytes
+
+
+def measure(fn, conn, rows, memory):
+    started = time.perf_counter()
+    size = fn(conn, rows)
+    elapsed = time.perf_counter() - started
+    peak = None
+    if memory:
+        # A separate run: tracemalloc slows the render several times over.
+        tracemalloc.start()
+        fn(conn, rows)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return elapsed, peak, size
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--legacy-rows", type=int, default=5_000, help="0 skips the old approach")
+    parser.add_argument("--memory", action="store_true", help="also measure peak Python memory")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = _seed(os.path.join(tmp, "bench.db"), args.rows)
+        print(f"{'approach':<12} {'rows':>8} {'seconds':>8} {'rows/s':>9} {'peak MB':>8} {'PDF MB':>7}")
+        runs = [("streaming", streaming, args.rows)]
+        if args.legacy_rows:
+            runs.insert(0, ("one table", legacy, args.legacy_rows))
+            runs.insert(1, ("streaming", streaming, args.legacy_rows))
+        for name, fn, rows in runs:
+            elapsed, peak, size = measure(fn, conn, rows, args.memory)
+            peak = f"{peak / 2**20:.1f}" if peak is not None else "-"
+            print(f"{name:<12} {rows:>8} {elapsed:>8.2f} {rows / elapsed:>9.0f} {peak:>8} {size / 2**20:>7.1f}")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Time printing a day's appointment slips: one merged PDF vs one PDF per slip.
+
+    python benchmarks/bench_slips.py --slips 2000
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import migrations  # noqa: E402
+import slips  # noqa: E402
+from layouts import FRONT_DESK  # noqa: E402
+
+DAY = "2024-05-02"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--slips", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(":memory:")
+    migrations.migrate(conn, FRONT_DESK)
+    with conn:
+        conn.executemany(
+            "INSERT INTO Appointments VALUES(NULL,?,?,?,?,?)",
+            [(f"Patient {i} | 35202-{i:07d}-1", f"Dr {i % 20} | 61101-{i % 20:07d}-1", DAY,
+              f"{8 + i % 10:02d}:{i % 60:02d}:00", "Scheduled") for i in range(args.slips)],
+        )
+
+    started = time.perf_counter()
+    ids = [i for (i,) in conn.execute("SELECT id FROM Appointments WHERE date = ?", (DAY,))]
+    total = sum(len(slips.slip_pdf(conn, i)) for i in ids)
+    one_by_one = time.perf_counter() - started
+
+    started = time.perf_counter()
+    merged = slips.batch_pdf(conn, DAY, DAY)
+    batch = time.perf_counter() - started
+
+    print(f"{'approach':<12} {'slips':>6} {'seconds':>8} {'slips/s':>8} {'MB':>6}")
+    print(f"{'one by one':<12} {len(ids):>6} {one_by_one:>8.2f} {len(ids) / one_by_one:>8.0f} {total / 2**20:>6.1f}")
+    print(f"{'merged':<12} {len(ids):>6} {batch:>8.2f} {len(ids) / batch:>8.0f} {len(merged) / 2**20:>6.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Cold-start time of each app's entry page, with an import-time breakdown.
+
+Each app is rendered once in a fresh interpreter started with
+``python -X importtime``, through Streamlit's AppTest harness against an
+empty database in a temporary directory.  Reported per app: wall time
+to the first finished render, total import time, and the import time
+of each heavy package (all of its submodules) that got loaded.
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 5 App.py
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APPS = ["App.py", "app.py", "graphs.py"]
+HEAVY = ["streamlit", "pandas", "matplotlib", "seaborn", "plotly", "reportlab"]
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+
+def _child(app):
+    started = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+
+    os.chdir(tempfile.mkdtemp())
+    at = AppTest.from_file(os.path.join(REPO, app), default_timeout=120)
+    at.run()
+    if at.exception:
+        raise SystemExit(f"{app} failed: {at.exception[0].value}")
+    print(f"first_render={time.perf_counter() - started:.4f}")
+
+
+def _importtimes(stderr):
+    """Top-level import total (ms) and {package: ms} for the HEAVY packages loaded."""
+    total, heavy = 0, {}
+    for self_us, cumulative_us, indent, name in _LINE.findall(stderr):
+        if not indent:
+            total += int(cumulative_us)
+        package = name.split(".")[0]
+        if package in HEAVY:
+            heavy[package] = heavy.get(package, 0) + int(self_us)
+    return total / 1000, {name: heavy[name] / 1000 for name in HEAVY if name in heavy}
+
+
+def measure(app):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", os.path.abspath(__file__), "--child", app],
+        capture_output=True, text=True, cwd=REPO, check=True,
+    )
+    first_render = float(re.search(r"first_render=([\d.]+)", result.stdout).group(1))
+    return (first_render, *_importtimes(result.stderr))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("apps", nargs="*", default=APPS)
+    parser.add_argument("--runs", type=int, default=3, help="best of N cold starts")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        return _child(args.child)
+
+    print(f"{'app':<10} {'first render s':>14} {'imports ms':>11}  heavy packages (ms)")
+    for app in args.apps:
+        first_render, total, heavy = min(measure(app) for _ in range(args.runs))
+        loaded = ", ".join(f"{name} {ms:.0f}" for name, ms in heavy.items()) or "-"
+        print(f"{app:<10} {first_render:>14.2f} {total:>11.0f}  {loaded}")
+
+
+if __name__ == "__main__":
+    main()
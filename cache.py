@@ -0,0 +1,148 @@
+"""Process-wide read cache invalidated by per-table write generations.
+
+Every tracked table has a row in ``TableVersions`` whose ``version`` is
+bumped by triggers on insert, update and delete, so writes from any
+session or process are seen.  A cached read is keyed on its arguments and
+the versions of the tables it reads, and stays valid until one of those
+tables is written.
+
+Reading ``TableVersions`` itself is skipped while the connection's
+``PRAGMA data_version`` (commits by other connections) and
+``total_changes`` (its own writes) are unchanged.
+"""
+import functools
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+import db
+
+MAX_ENTRIES = 256
+
+_TABLE_REF = re.compile(r"\b(?:FROM|JOIN|INTO|UPDATE)\s+([A-Za-z_]\w*)", re.IGNORECASE)
+
+
+def install(conn, layout):
+    """Create TableVersions and the triggers that bump it for every app table."""
+    sql = ["""
+        CREATE TABLE IF NOT EXISTS TableVersions(
+            tbl TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        );
+    """]
+    for table in layout.tables:
+        sql.append(f"INSERT OR IGNORE INTO TableVersions VALUES ('{table}', 0);")
+        bump = (f"INSERT INTO TableVersions(tbl, version) VALUES ('{table}', 1) "
+                f"ON CONFLICT(tbl) DO UPDATE SET version = version + 1;")
+        for op in ("INSERT", "UPDATE", "DELETE"):
+            sql.append(f"""
+                CREATE TRIGGER IF NOT EXISTS version_{table}_{op.lower()} AFTER {op} ON {table} BEGIN
+                    {bump}
+                END;
+            """)
+    conn.executescript("".join(sql))
+
+
+class _Versions(threading.local):
+    def __init__(self):
+        self.seen = {}  # id(conn) -> (data_version, total_changes, versions)
+
+
+_versions = _Versions()
+
+
+def table_versions(conn):
+    """{table: write generation} as of now, re-read only after a commit."""
+    stamp = (conn.execute("PRAGMA data_version").fetchone()[0], conn.total_changes)
+    seen = _versions.seen.get(id(conn))
+    if seen is not None and seen[:2] == stamp:
+        return seen[2]
+    versions = dict(conn.execute("SELECT tbl, version FROM TableVersions").fetchall())
+    _versions.seen[id(conn)] = (*stamp, versions)
+    return versions
+
+
+def tables_in(sql, *args, **kwargs):
+    """Table names referenced by a SQL string."""
+    return set(_TABLE_REF.findall(sql))
+
+
+def _freeze(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+
+class LRUCache:
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_cache = LRUCache()
+
+
+def _copy(value):
+    # Callers are free to mutate the DataFrames they get back.
+    return value.copy() if isinstance(value, pd.DataFrame) else value
+
+
+def cached_read(db_path, tables=tables_in):
+    """Decorator caching a read helper until a write touches the tables it reads.
+
+    ``tables(*args, **kwargs)`` names the tables a call reads; by default
+    they are parsed from the first argument as SQL.  If any of them is not
+    tracked in TableVersions (rollups, search indexes), a write to any
+    table invalidates the entry.
+    """
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            versions = table_versions(db.connection(db_path))
+            names = tables(*args, **kwargs)
+            if not names or not names <= versions.keys():
+                names = versions.keys()
+            generation = tuple(sorted((t, versions[t]) for t in names))
+            key = (os.path.abspath(db_path), fn.__qualname__, _freeze(args), _freeze(kwargs), generation)
+            hit, value = _cache.get(key)
+            if not hit:
+                value = fn(*args, **kwargs)
+                _cache.put(key, value)
+            return _copy(value)
+        return wrapper
+    return decorate
+
+
+def stats():
+    return {"hits": _cache.hits, "misses": _cache.misses, "entries": len(_cache._entries)}
+
+
+def clear():
+    _cache.clear()
@@ -0,0 +1,213 @@
+"""Change-data-capture log and dashboard aggregates maintained from it.
+
+Triggers on every table of a layout append ``(table, op, row id, ts)`` to
+``ChangeLog``; UPDATE and DELETE entries also carry the row as it was, as
+JSON, in ``old``.  A ``CountBy`` aggregate is built from its base table
+with one GROUP BY per process, then kept current by applying only the log
+entries past its watermark: the key each changed row counted under is
+evaluated on the old row of its first entry and taken out, and the key of
+the row as re-read by primary key is added.  Only the counts are held in
+memory.  A dashboard rerun with no new log entries costs two indexed
+lookups on the log.
+
+    PATIENTS_BY_GENDER = changes.CountBy("Patients", "gender")
+    counts = PATIENTS_BY_GENDER.refresh(db_path, layout)   # pd.Series
+
+The log is pruned after ``KEEP_FOR``; an aggregate whose watermark falls
+behind the pruned part rebuilds from the base table.
+"""
+import json
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+import db
+import writer
+
+KEEP_FOR = timedelta(days=7)
+PRUNE_EVERY = 3600  # seconds between prunes per database file
+# Past this many changed rows (as a share of the table) a rebuild is cheaper.
+REBUILD_SHARE = 0.5
+# Tables whose old rows are not copied into the log (credentials).
+NO_OLD_ROWS = ("Users",)
+
+_NOW = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS ChangeLog(
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        tbl TEXT NOT NULL,
+        op TEXT NOT NULL,  -- INSERT, UPDATE or DELETE
+        row_id,
+        ts TEXT NOT NULL,
+        old TEXT  -- json_object() of the row before an UPDATE or DELETE
+    )
+"""
+
+
+def _columns(conn, table):
+    return [name for _, name, *_ in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def _old_row(conn, table):
+    if table in NO_OLD_ROWS:
+        return "NULL"
+    return "json_object(" + ", ".join(f"'{column}', OLD.{column}" for column in _columns(conn, table)) + ")"
+
+
+def install(conn, layout):
+    """Create ChangeLog and (re)create the triggers feeding it for every table of ``layout``.
+
+    The old-row JSON lists the table's columns as they are now, so a
+    migration that adds a column runs this again.
+    """
+    conn.execute("BEGIN IMMEDIATE")  # checked and rebuilt by one process at a time
+    with conn:
+        conn.execute(SCHEMA)
+        if "old" not in _columns(conn, "ChangeLog"):
+            conn.execute("ALTER TABLE ChangeLog ADD COLUMN old TEXT")
+        for table, pk in layout.primary_keys.items():
+            old = _old_row(conn, table)
+            for op in ("insert", "update", "delete"):
+                conn.execute(f"DROP TRIGGER IF EXISTS changelog_{table}_{op}")
+            conn.execute(f"""
+                CREATE TRIGGER changelog_{table}_insert AFTER INSERT ON {table} BEGIN
+                    INSERT INTO ChangeLog(tbl, op, row_id, ts) VALUES ('{table}', 'INSERT', NEW.{pk}, {_NOW});
+                END
+            """)
+            # A changed primary key is logged as a DELETE of the old id,
+            # which carries the old row, and an UPDATE of the new one.
+            conn.execute(f"""
+                CREATE TRIGGER changelog_{table}_update AFTER UPDATE ON {table} BEGIN
+                    INSERT INTO ChangeLog(tbl, op, row_id, ts, old)
+                    VALUES ('{table}', 'UPDATE', NEW.{pk}, {_NOW}, CASE WHEN OLD.{pk} IS NEW.{pk} THEN {old} END);
+                    INSERT INTO ChangeLog(tbl, op, row_id, ts, old)
+                    SELECT '{table}', 'DELETE', OLD.{pk}, {_NOW}, {old} WHERE OLD.{pk} IS NOT NEW.{pk};
+                END
+            """)
+            conn.execute(f"""
+                CREATE TRIGGER changelog_{table}_delete AFTER DELETE ON {table} BEGIN
+                    INSERT INTO ChangeLog(tbl, op, row_id, ts, old) VALUES ('{table}', 'DELETE', OLD.{pk}, {_NOW}, {old});
+                END
+            """)
+
+
+def changes_since(conn, watermark, table=None):
+    """Log entries (seq, tbl, op, row_id, ts) after ``watermark``, oldest first."""
+    sql = "SELECT seq, tbl, op, row_id, ts FROM ChangeLog WHERE seq > ?"
+    params = [watermark]
+    if table is not None:
+        sql += " AND tbl = ?"
+        params.append(table)
+    return conn.execute(sql + " ORDER BY seq", params).fetchall()
+
+
+def log_bounds(conn):
+    """(oldest seq still in the log or None, last seq ever assigned or 0)."""
+    top = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'ChangeLog'").fetchone()
+    first = conn.execute("SELECT MIN(seq) FROM ChangeLog").fetchone()[0]
+    return first, top[0] if top else 0
+
+
+def replayable(conn, watermark):
+    """Whether every entry after ``watermark`` is still in the log; returns (ok, top)."""
+    first, top = log_bounds(conn)
+    if watermark is None:
+        return False, top
+    # Entries past the watermark were pruned: the log cannot be replayed.
+    return not (top > watermark and (first is None or first > watermark + 1)), top
+
+
+_pruned = {}  # db file -> time.monotonic() of the last prune
+
+
+def prune(db_path, keep=KEEP_FOR):
+    """Queue deletion of log entries older than ``keep``; returns the writer future."""
+    _pruned[os.path.abspath(db_path)] = time.monotonic()
+    cutoff = (datetime.now(timezone.utc) - keep).strftime("%Y-%m-%d %H:%M:%S")
+    return writer.get_writer(db_path).submit("DELETE FROM ChangeLog WHERE ts < ?", (cutoff,))
+
+
+class _State:
+    def __init__(self):
+        self.watermark = None
+        self.counts = Counter()
+
+
+class CountBy:
+    """Row counts of ``table`` per value of the SQL expression ``key``.
+
+    Rows whose key is NULL are not counted.  ``key`` is also evaluated on
+    the old rows carried by the log, so it may only refer to the table's
+    own columns.
+    """
+
+    def __init__(self, table, key, name="Count"):
+        self.table = table
+        self.key = key
+        self.name = name
+        self._states = {}  # db file -> _State
+        self._lock = threading.Lock()
+
+    def _rebuild(self, conn, state, top):
+        rows = conn.execute(
+            f"SELECT key, COUNT(*) FROM (SELECT {self.key} AS key FROM {self.table}) "
+            f"WHERE key IS NOT NULL GROUP BY key"
+        )
+        state.counts = Counter(dict(rows))
+        state.watermark = top
+
+    def _keys(self, conn, sql, rows):
+        """Non-NULL keys of the ``rows`` selected by ``sql`` (which reads them from json_each)."""
+        return [key for (key,) in conn.execute(f"SELECT {self.key} FROM ({sql})", (json.dumps(rows),))
+                if key is not None]
+
+    def _apply(self, conn, state, pk, first):
+        """Apply the changes of the rows in ``first`` (row id -> old row of its first entry)."""
+        # The first entry past the watermark holds the row as it was counted;
+        # an INSERT has none.
+        old = [row for row in first.values() if row is not None]
+        fields = ", ".join(f"json_extract(value, '$.{column}') AS {column}" for column in _columns(conn, self.table))
+        state.counts.subtract(self._keys(conn, f"SELECT {fields} FROM json_each(?)", old))
+        state.counts.update(self._keys(
+            conn, f"SELECT * FROM {self.table} WHERE {pk} IN (SELECT value FROM json_each(?))", list(first)))
+        state.counts = +state.counts  # drop keys counted down to zero
+
+    def refresh(self, db_path, layout):
+        """Counts as of now (a Series indexed by key, sorted), applying new log entries."""
+        path = os.path.abspath(db_path)
+        if time.monotonic() - _pruned.get(path, 0) > PRUNE_EVERY:
+            prune(db_path)
+        pk = layout.primary_keys[self.table]
+        conn = db.connection(db_path)
+        with self._lock:
+            state = self._states.setdefault(path, _State())
+            # One read transaction, so the watermark matches the rows read.
+            own = not conn.in_transaction
+            if own:
+                conn.execute("BEGIN")
+            try:
+                ok, top = replayable(conn, state.watermark)
+                if not ok:
+                    self._rebuild(conn, state, top)
+                elif top > state.watermark:
+                    first = {}
+                    for row_id, old in conn.execute(
+                        "SELECT row_id, old FROM ChangeLog WHERE seq > ? AND tbl = ? ORDER BY seq",
+                        (state.watermark, self.table),
+                    ):
+                        first.setdefault(row_id, old)
+                    if len(first) > REBUILD_SHARE * max(sum(state.counts.values()), 1):
+                        self._rebuild(conn, state, top)
+                    else:
+                        self._apply(conn, state, pk, first)
+                        state.watermark = top
+            finally:
+                if own:
+                    conn.execute("COMMIT")
+            counts = dict(state.counts)
+        return pd.Series(counts, name=self.name, dtype="int64").sort_index()
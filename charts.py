@@ -0,0 +1,62 @@
+"""Matplotlib/seaborn charts rendered to PNG or SVG bytes.
+
+Charts are drawn on a small pool of reusable Agg figures that never go
+through pyplot, so no figure is left registered between reruns; each
+figure is cleared as soon as its image is saved.  Pair render() with
+cache.cached_read() keyed on the tables behind the chart's rollup, and a
+rerun with unchanged data returns the cached bytes without importing
+matplotlib at all.
+"""
+import io
+import threading
+
+POOL_SIZE = 4
+FIGSIZE = (6.4, 4.8)  # matplotlib's default, as st.pyplot drew before
+DPI = 100
+
+_idle = []
+_lock = threading.Lock()
+_themed = False
+
+
+def seaborn():
+    """seaborn, imported and themed on first use."""
+    global _themed
+    import seaborn as sns
+
+    if not _themed:
+        sns.set_theme(style="whitegrid")
+        _themed = True
+    return sns
+
+
+def _figure():
+    with _lock:
+        if _idle:
+            return _idle.pop()
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=FIGSIZE, dpi=DPI)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def render(draw, fmt="png", figsize=FIGSIZE):
+    """Call ``draw(ax)`` on a pooled figure and return the image as bytes."""
+    fig = _figure()
+    try:
+        fig.set_size_inches(figsize)
+        draw(fig.subplots())
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format=fmt)
+        return buffer.getvalue()
+    finally:
+        fig.clear()
+        with _lock:
+            if len(_idle) < POOL_SIZE:
+                _idle.append(fig)
+
+
+def stats():
+    return {"idle_figures": len(_idle)}
@@ -0,0 +1,152 @@
+"""Vectorized CNIC validation and normalization.
+
+A CNIC is written ``xxxxx-xxxxxxx-x``.  Every function takes a single
+string, a list of strings or a pandas Series and returns the same shape:
+a bool / list of bools / bool Series for the checks, cleaned strings for
+``normalize()``.  Series go through pandas' vectorized string methods;
+lists and scalars through one precompiled pattern.
+
+    python cnics.py scan --db hospital.db --layout management
+"""
+import argparse
+import re
+import sys
+
+import pandas as pd
+
+import db
+
+PATTERN = re.compile(r"\d{5}-\d{7}-\d")
+_SEPARATORS = re.compile(r"[\s\-]+")
+_DIGITS = re.compile(r"(\d{5})(\d{7})(\d)")
+
+# CNICs carry no check digit; these catch placeholder and typo values.
+# Written without backreferences so pandas can hand them to pyarrow's RE2.
+_IMPLAUSIBLE = re.compile("|".join([
+    r"[^1-7].*",       # first digit is the province code, 1 (KP) to 7 (GB)
+    r".*-0{7}-.*",     # empty family/serial block
+    *(f"{d}{{5}}-{d}{{7}}-{d}" for d in "0123456789"),  # 11111-1111111-1 etc.
+]))
+
+
+def _apply(values, series_fn, item_fn):
+    if isinstance(values, pd.Series):
+        return series_fn(values)
+    if isinstance(values, (list, tuple)):
+        return [item_fn(v) for v in values]
+    return item_fn(values)
+
+
+def _normalize_one(value):
+    if not isinstance(value, str):
+        return value
+    digits = _SEPARATORS.sub("", value)
+    match = _DIGITS.fullmatch(digits)
+    return "-".join(match.groups()) if match else value.strip()
+
+
+def normalize(values):
+    """Strip whitespace and put 13-digit CNICs, spaced or bare, into dashed form.
+
+    Values that are not 13 digits come back stripped but otherwise as is,
+    so they still fail is_valid().
+    """
+    def series(s):
+        s = s.astype("str").where(s.notna())
+        todo = ~s.str.fullmatch(PATTERN.pattern).fillna(False).astype(bool)
+        if not todo.any():
+            return s
+        rest = s[todo]
+        digits = rest.str.replace(_SEPARATORS.pattern, "", regex=True)
+        dashed = digits.str.replace(r"^(\d{5})(\d{7})(\d)$", r"\1-\2-\3", regex=True)
+        s = s.copy()
+        s[todo] = dashed.where(dashed.str.fullmatch(PATTERN.pattern).fillna(False).astype(bool),
+                               rest.str.strip())
+        return s
+    return _apply(values, series, _normalize_one)
+
+
+def is_valid(values):
+    """True where the value is exactly ``xxxxx-xxxxxxx-x``."""
+    return _apply(
+        values,
+        lambda s: s.astype("str").str.fullmatch(PATTERN.pattern).fillna(False).astype(bool)
+        & s.notna(),
+        lambda v: isinstance(v, str) and PATTERN.fullmatch(v) is not None,
+    )
+
+
+def is_plausible(values):
+    """True where a valid CNIC also passes the sanity checks.
+
+    CNICs carry no check digit, so this catches the typical placeholder and
+    typo values instead: an unknown province code, an all-zero block, or
+    one digit repeated throughout.
+    """
+    def series(s):
+        s = s.astype("str")
+        return is_valid(s) & ~s.str.fullmatch(_IMPLAUSIBLE.pattern).fillna(False).astype(bool)
+    return _apply(
+        values,
+        series,
+        lambda v: is_valid(v) and _IMPLAUSIBLE.fullmatch(v) is None,
+    )
+
+
+def check(values):
+    """Normalize and check a column at once.
+
+    Returns a DataFrame with the cleaned ``cnic`` and boolean ``valid`` and
+    ``plausible`` columns, aligned with the input.
+    """
+    cleaned = normalize(pd.Series(values) if not isinstance(values, pd.Series) else values)
+    return pd.DataFrame({
+        "cnic": cleaned,
+        "valid": is_valid(cleaned),
+        "plausible": is_plausible(cleaned),
+    })
+
+
+def scan(conn, table, column="cnic", chunk_size=100_000):
+    """Data-quality scan of ``table.column``: (rows, invalid, implausible, fixable).
+
+    ``fixable`` counts invalid values that normalize() turns into valid ones.
+    """
+    rows = invalid = implausible = fixable = 0
+    for chunk in pd.read_sql_query(f"SELECT {column} FROM {table}", conn, chunksize=chunk_size):
+        raw = chunk[column]
+        valid = is_valid(raw)
+        result = check(raw)
+        rows += len(raw)
+        invalid += int((~valid).sum())
+        implausible += int((valid & ~result["plausible"]).sum())
+        fixable += int((~valid & result["valid"]).sum())
+    return rows, invalid, implausible, fixable
+
+
+CNIC_COLUMNS = {
+    "management": {"Patients": ["cnic"], "Doctors": ["cnic"],
+                   "Appointments": ["patient_cnic", "doctor_cnic"], "Billings": ["patient_cnic"]},
+    "front_desk": {"Patients": ["cnic"], "Doctors": ["cnic"]},
+    "charts": {},
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scan stored CNICs for invalid or implausible values.")
+    parser.add_argument("command", choices=["scan"])
+    parser.add_argument("--db", default="hospital.db")
+    parser.add_argument("--layout", choices=sorted(CNIC_COLUMNS), default="management")
+    args = parser.parse_args(argv)
+
+    conn = db.connection(args.db)
+    print(f"{'column':<28} {'rows':>10} {'invalid':>8} {'implaus.':>8} {'fixable':>8}")
+    for table, columns in CNIC_COLUMNS[args.layout].items():
+        for column in columns:
+            rows, invalid, implausible, fixable = scan(conn, table, column)
+            print(f"{table + '.' + column:<28} {rows:>10} {invalid:>8} {implausible:>8} {fixable:>8}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
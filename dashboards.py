@@ -0,0 +1,16 @@
+"""Change-log aggregates behind graphs.py's patient charts.
+
+They live here rather than in the page script: Streamlit re-executes the
+script on every rerun, which would start each aggregate over with no
+watermark, while imported modules keep their state between reruns.
+"""
+import changes
+
+AGE_GROUPS = ["0-18", "19-35", "36-50", "51-65", "65+"]
+
+PATIENTS_BY_MONTH = changes.CountBy("Patients", "strftime('%Y-%m', registration_date)")
+PATIENTS_BY_GENDER = changes.CountBy("Patients", "gender")
+PATIENTS_BY_AGE = changes.CountBy("Patients", """CASE
+    WHEN age > 0 AND age <= 18 THEN '0-18' WHEN age > 18 AND age <= 35 THEN '19-35'
+    WHEN age > 35 AND age <= 50 THEN '36-50' WHEN age > 50 AND age <= 65 THEN '51-65'
+    WHEN age > 65 AND age <= 120 THEN '65+' END""", name="count")
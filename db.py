@@ -0,0 +1,144 @@
+"""Shared SQLite connection pool used by App.py, app.py and graphs.py.
+
+Streamlit re-executes the page script on every interaction, but imported
+modules stay loaded, so the pools kept here outlive reruns and sessions.
+Each thread gets its own connection; when a script thread finishes, its
+connection goes back to the pool for the next thread instead of being
+closed.  New connections get the PRAGMAs of the deployment's profile
+(``HOSPITAL_DB_PROFILE``, default ``wal``).
+"""
+import atexit
+import os
+import sqlite3
+import threading
+
+# PRAGMA profiles, picked per deployment with HOSPITAL_DB_PROFILE.  They are
+# applied in order, so busy_timeout comes first to cover the others.
+PROFILES = {
+    # SQLite defaults: rollback journal, readers block while a writer commits.
+    # Use this where WAL is unavailable (e.g. network file systems).  WAL mode
+    # is stored in the database file, so it is switched back explicitly.
+    "rollback": {
+        "busy_timeout": 5000,
+        "journal_mode": "DELETE",
+        "foreign_keys": "ON",
+    },
+    # WAL lets readers run alongside the single writer; NORMAL sync is
+    # durable across application crashes and only fsyncs at checkpoints.
+    "wal": {
+        "busy_timeout": 5000,
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "foreign_keys": "ON",
+        "temp_store": "MEMORY",
+        "cache_size": -64 * 1024,  # KiB, i.e. 64 MiB per connection
+        "mmap_size": 256 * 1024 * 1024,
+    },
+    # Same as "wal" sized for a dedicated server with a multi-GB database.
+    "wal-large": {
+        "busy_timeout": 10000,
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "foreign_keys": "ON",
+        "temp_store": "MEMORY",
+        "cache_size": -512 * 1024,
+        "mmap_size": 4 * 1024 * 1024 * 1024,
+    },
+}
+DEFAULT_PROFILE = "wal"
+
+
+def profile_pragmas(name=None):
+    """PRAGMAs for profile ``name``, or for $HOSPITAL_DB_PROFILE when omitted."""
+    name = name or os.environ.get("HOSPITAL_DB_PROFILE", DEFAULT_PROFILE)
+    if name not in PROFILES:
+        raise ValueError(f"unknown database profile {name!r}; expected one of {sorted(PROFILES)}")
+    return PROFILES[name]
+
+
+class ConnectionPool:
+    def __init__(self, path, pragmas=None):
+        self.path = path
+        self.pragmas = dict(profile_pragmas() if pragmas is None else pragmas)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._owners = {}  # connection -> owning thread
+        self._idle = []
+        self._closed = False
+
+    def _connect(self):
+        # Connections are handed to a new thread only once their previous
+        # owner has exited, so they are never used from two threads at once.
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name}={value}")
+        return conn
+
+    def _reclaim(self):
+        for conn, owner in list(self._owners.items()):
+            if not owner.is_alive():
+                del self._owners[conn]
+                if conn.in_transaction:
+                    conn.rollback()
+                self._idle.append(conn)
+
+    def connection(self):
+        """Return the calling thread's connection, opening one if needed."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and not self._closed:
+            return conn
+        with self._lock:
+            if self._closed:
+                raise sqlite3.ProgrammingError(f"connection pool for {self.path} is closed")
+            self._reclaim()
+            conn = self._idle.pop() if self._idle else self._connect()
+            self._owners[conn] = threading.current_thread()
+        self._local.conn = conn
+        return conn
+
+    def close(self):
+        """Close every pooled connection; later calls to connection() fail."""
+        with self._lock:
+            self._closed = True
+            conns = list(self._owners) + self._idle
+            self._owners.clear()
+            self._idle.clear()
+        for conn in conns:
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {"in_use": len(self._owners), "idle": len(self._idle)}
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(path, pragmas=None):
+    """Return the process-wide pool for ``path``, creating it on first use."""
+    key = os.path.abspath(path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None or pool._closed:
+            pool = _pools[key] = ConnectionPool(path, pragmas)
+        return pool
+
+
+def connection(path):
+    """Shortcut for ``get_pool(path).connection()``."""
+    return get_pool(path).connection()
+
+
+def close_all():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+atexit.register(close_all)
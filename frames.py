@@ -0,0 +1,130 @@
+"""Typed DataFrames for the apps' tables.
+
+``read_sql`` hands back int64/float64 for every number and a string
+column for every text one.  SCHEMAS declares, per layout and table, a
+smaller dtype where one fits: categoricals for low-cardinality text
+(status, gender, department, time slots, ...), narrower integers, and
+dates parsed once into datetime64.  load() reads and converts; typed()
+converts a frame that is already loaded.  A column whose values do not fit its
+declared dtype is left as read.
+
+    python frames.py --db hospital.db --layout charts   # memory per table
+"""
+import argparse
+import sys
+from typing import NamedTuple
+
+import pandas as pd
+
+import db
+from layouts import LAYOUTS
+
+DATE = "datetime"  # parsed with pd.to_datetime; unparseable values become NaT
+
+# Primary keys are never NULL, so they get plain numpy ints; other integer
+# columns use the nullable types.
+SCHEMAS = {
+    "management": {
+        "Patients": {"id": "int32"},
+        "Departments": {"id": "int32"},
+        "Doctors": {"id": "int32", "department": "category"},
+        "Appointments": {"id": "int32", "doctor": "category", "date": DATE, "time": "category",
+                         "status": "category"},
+        "Billings": {"id": "int32", "status": "category"},
+    },
+    "front_desk": {
+        "Users": {"role": "category"},
+        "Patients": {"id": "int32"},
+        "Doctors": {"id": "int32", "specialty": "category"},
+        "Appointments": {"id": "int32", "doctor": "category", "date": DATE, "time": "category",
+                         "status": "category"},
+    },
+    "charts": {
+        "Patients": {"pat_id": "int32", "age": "Int16", "gender": "category", "registration_date": DATE},
+        "Doctors": {"doc_id": "int32", "specialty": "category", "dept_id": "Int32"},
+        "Appointments": {"app_id": "int32", "pat_id": "Int32", "doc_id": "Int32",
+                         "app_date": DATE, "app_time": "category", "status": "category"},
+        "MedicalRecords": {"record_id": "int32", "pat_id": "Int32", "doc_id": "Int32"},
+        "Billings": {"bill_id": "int32", "pat_id": "Int32", "payment_status": "category",
+                     "bill_date": DATE},
+    },
+}
+
+
+class MemoryReport(NamedTuple):
+    table: str
+    rows: int
+    before: int  # bytes, as read_sql returns it
+    after: int   # bytes, typed
+
+    @property
+    def saved(self):
+        return self.before - self.after
+
+
+def _columns(layout, table=None):
+    """Declared dtypes of ``table``, or of every column name in the layout."""
+    schemas = SCHEMAS[layout.name]
+    if table is not None:
+        return schemas.get(table, {})
+    merged = {}
+    for schema in schemas.values():
+        for column, dtype in schema.items():
+            merged.setdefault(column, dtype)
+    return merged
+
+
+def _convert(series, dtype):
+    try:
+        if dtype == DATE:
+            return pd.to_datetime(series, errors="coerce", format="ISO8601")
+        return series.astype(dtype)
+    except (TypeError, ValueError, OverflowError):
+        return series
+
+
+def typed(df, layout, table=None):
+    """``df`` with its columns converted to their declared dtypes.
+
+    Without ``table`` (e.g. for a join) each column is matched by name
+    against every table of the layout.
+    """
+    schema = _columns(layout, table)
+    converted = {column: _convert(df[column], schema[column]) for column in df.columns if column in schema}
+    return df.assign(**converted) if converted else df
+
+
+def load(conn, sql, layout, params=(), table=None):
+    """pd.read_sql(sql) with the declared dtypes applied."""
+    return typed(pd.read_sql(sql, conn, params=params), layout, table)
+
+
+def memory(df):
+    return int(df.memory_usage(deep=True).sum())
+
+
+def memory_report(conn, layout):
+    """Memory of each table loaded whole, as read_sql returns it and typed."""
+    reports = []
+    for table in layout.tables:
+        plain = pd.read_sql(f"SELECT * FROM {table}", conn)
+        reports.append(MemoryReport(table, len(plain), memory(plain), memory(typed(plain, layout, table))))
+    return reports
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report the memory typed loading saves per table.")
+    parser.add_argument("--db", default="hospital.db")
+    parser.add_argument("--layout", choices=sorted(LAYOUTS), default="management")
+    args = parser.parse_args(argv)
+
+    print(f"{'table':<16} {'rows':>10} {'read_sql MB':>12} {'typed MB':>9} {'saved':>6}")
+    for report in memory_report(db.connection(args.db), LAYOUTS[args.layout]):
+        share = report.saved / report.before if report.before else 0
+        print(f"{report.table:<16} {report.rows:>10} {report.before / 2**20:>12.1f} "
+              f"{report.after / 2**20:>9.1f} {share:>6.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
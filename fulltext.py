@@ -0,0 +1,93 @@
+"""FTS5 trigram indexes for patient and doctor search.
+
+``WHERE name LIKE '%x%'`` can never use a b-tree index.  The trigram
+tokenizer indexes every three-character substring, so a substring search
+becomes an index lookup.  The indexes are external-content FTS tables kept
+in sync with their base tables by triggers.
+"""
+import pandas as pd
+
+# Searchable columns per layout and table.
+SEARCH_COLUMNS = {
+    "management": {"Patients": ("name", "cnic", "phone"), "Doctors": ("name", "cnic")},
+    "front_desk": {"Patients": ("name", "cnic", "phone"), "Doctors": ("name", "cnic")},
+    "charts": {"Patients": ("name", "phone"), "Doctors": ("name", "phone")},
+}
+
+# Trigrams need at least three characters; shorter terms fall back to LIKE.
+MIN_TERM_LENGTH = 3
+
+
+def _index(table):
+    return f"{table}Search"
+
+
+def install(conn, layout):
+    """Create the FTS tables and sync triggers, and index existing rows."""
+    for table, columns in SEARCH_COLUMNS[layout.name].items():
+        index, key = _index(table), layout.primary_keys[table]
+        cols = ", ".join(columns)
+        new = ", ".join(f"NEW.{c}" for c in columns)
+        old = ", ".join(f"OLD.{c}" for c in columns)
+        conn.executescript(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {index} USING fts5(
+                {cols}, content='{table}', content_rowid='{key}', tokenize='trigram'
+            );
+            CREATE TRIGGER IF NOT EXISTS {index}_ins AFTER INSERT ON {table} BEGIN
+                INSERT INTO {index}(rowid, {cols}) VALUES (NEW.{key}, {new});
+            END;
+            CREATE TRIGGER IF NOT EXISTS {index}_del AFTER DELETE ON {table} BEGIN
+                INSERT INTO {index}({index}, rowid, {cols}) VALUES ('delete', OLD.{key}, {old});
+            END;
+            CREATE TRIGGER IF NOT EXISTS {index}_upd AFTER UPDATE ON {table} BEGIN
+                INSERT INTO {index}({index}, rowid, {cols}) VALUES ('delete', OLD.{key}, {old});
+                INSERT INTO {index}(rowid, {cols}) VALUES (NEW.{key}, {new});
+            END;
+            INSERT INTO {index}({index}) VALUES ('rebuild');
+        """)
+
+
+def _match_expr(term, columns):
+    phrase = '"' + term.replace('"', '""') + '"'
+    return f"{{{' '.join(columns)}}} : {phrase}"
+
+
+def _like(term, columns):
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    where = " OR ".join(f"{c} LIKE ? ESCAPE '\\'" for c in columns)
+    return where, [f"%{escaped}%"] * len(columns)
+
+
+def search(conn, layout, table, term, columns=None, limit=50, offset=0):
+    """Rows of ``table`` containing ``term`` in any of ``columns``, best match first.
+
+    Matching is case-insensitive and literal (no wildcards or regex).
+    ``columns`` defaults to every indexed column of the table; ``limit`` and
+    ``offset`` page through the results.
+    """
+    columns = tuple(columns or SEARCH_COLUMNS[layout.name][table])
+    key = layout.primary_keys[table]
+    if len(term) < MIN_TERM_LENGTH:
+        where, params = _like(term, columns)
+        return pd.read_sql(
+            f"SELECT * FROM {table} WHERE {where} ORDER BY {key} LIMIT ? OFFSET ?",
+            conn, params=params + [limit, offset],
+        )
+    index = _index(table)
+    return pd.read_sql(
+        f"SELECT t.* FROM {index} s JOIN {table} t ON t.{key} = s.rowid "
+        f"WHERE {index} MATCH ? ORDER BY s.rank, s.rowid LIMIT ? OFFSET ?",
+        conn, params=(_match_expr(term, columns), limit, offset),
+    )
+
+
+def count_matches(conn, layout, table, term, columns=None):
+    """Number of rows search() would page through for ``term``."""
+    columns = tuple(columns or SEARCH_COLUMNS[layout.name][table])
+    if len(term) < MIN_TERM_LENGTH:
+        where, params = _like(term, columns)
+        return conn.execute(f"SELECT COUNT(*) FROM {table} WHERE {where}", params).fetchone()[0]
+    index = _index(table)
+    return conn.execute(
+        f"SELECT COUNT(*) FROM {index} WHERE {index} MATCH ?", (_match_expr(term, columns),)
+    ).fetchone()[0]
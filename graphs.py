@@ -3,9 +3,19 @@
 # Includes beautiful native charts on Home page + additional charts in each module
 
 import streamlit as st
-import sqlite3
-import pandas as pd
 from datetime import datetime
+import analytics
+import cache
+import dashboards
+import db
+import frames
+import fulltext
+import grid
+import importer
+import kpis
+import migrations
+import writer
+from layouts import CHARTS
 
 # --------------------- Page Config & Custom CSS ---------------------
 st.set_page_config(
@@ -25,120 +35,56 @@ st.markdown("""
 
 # --------------------- Database Setup ---------------------
 DB_FILE = "hospital.db"
+SEARCH_PAGE_SIZE = 50
 
-def init_db():
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.executescript('''
-        CREATE TABLE IF NOT EXISTS Patients (
-            pat_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            age INTEGER,
-            gender TEXT,
-            phone TEXT,
-            address TEXT,
-            email TEXT,
-            registration_date TEXT DEFAULT (date('now'))
-        );
-        CREATE TABLE IF NOT EXISTS Doctors (
-            doc_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            specialty TEXT,
-            dept_id INTEGER,
-            phone TEXT,
-            email TEXT
-        );
-        CREATE TABLE IF NOT EXISTS Appointments (
-            app_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            pat_id INTEGER,
-            doc_id INTEGER,
-            app_date TEXT,
-            app_time TEXT,
-            status TEXT DEFAULT 'Scheduled'
-        );
-        CREATE TABLE IF NOT EXISTS MedicalRecords (
-            record_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            pat_id INTEGER,
-            doc_id INTEGER,
-            diagnosis TEXT,
-            treatment TEXT,
-            prescription TEXT
-        );
-        CREATE TABLE IF NOT EXISTS Billings (
-            bill_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            pat_id INTEGER,
-            amount REAL,
-            details TEXT,
-            payment_status TEXT DEFAULT 'Pending',
-            bill_date TEXT DEFAULT (date('now'))
-        );
-    ''')
-    conn.commit()
-    conn.close()
-
-init_db()
+migrations.ensure(DB_FILE, CHARTS)
 
 # --------------------- Helper Functions ---------------------
+@cache.cached_read(DB_FILE, tables=lambda table_name: {table_name})
 def get_data(table_name):
-    conn = sqlite3.connect(DB_FILE)
-    df = pd.read_sql_query(f"SELECT * FROM {table_name}", conn)
-    conn.close()
-    return df
+    return frames.load(db.connection(DB_FILE), f"SELECT * FROM {table_name}", CHARTS, table=table_name)
 
 def insert_record(table_name, fields, values):
-    conn = sqlite3.connect(DB_FILE)
     placeholders = ', '.join(['?' for _ in values])
     columns = ', '.join(fields)
     sql = f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})"
-    conn.execute(sql, values)
-    conn.commit()
-    conn.close()
+    return writer.get_writer(DB_FILE).execute(sql, values)
 
 def delete_record(table_name, id_column, record_id):
-    conn = sqlite3.connect(DB_FILE)
-    conn.execute(f"DELETE FROM {table_name} WHERE {id_column} = ?", (record_id,))
-    conn.commit()
-    conn.close()
+    writer.get_writer(DB_FILE).execute(f"DELETE FROM {table_name} WHERE {id_column} = ?", (record_id,))
 
 def update_record(table_name, id_column, record_id, fields, values):
-    conn = sqlite3.connect(DB_FILE)
     set_clause = ', '.join([f"{f} = ?" for f in fields])
     sql = f"UPDATE {table_name} SET {set_clause} WHERE {id_column} = ?"
     values.append(record_id)
-    conn.execute(sql, values)
-    conn.commit()
-    conn.close()
+    writer.get_writer(DB_FILE).execute(sql, values)
 
+@cache.cached_read(DB_FILE, tables=lambda table_name, *args: {table_name})
 def get_record(table_name, id_column, record_id):
-    conn = sqlite3.connect(DB_FILE)
-    row = conn.execute(f"SELECT * FROM {table_name} WHERE {id_column} = ?", (record_id,)).fetchone()
-    conn.close()
-    return row
+    return db.connection(DB_FILE).execute(f"SELECT * FROM {table_name} WHERE {id_column} = ?", (record_id,)).fetchone()
 
 # --------------------- Charts Functions ---------------------
 def show_home_charts():
-    patients = get_data("Patients")
-    appointments = get_data("Appointments")
+    aggregates = analytics.readers(DB_FILE, CHARTS)
+    growth = dashboards.PATIENTS_BY_MONTH.refresh(DB_FILE, CHARTS).rename_axis('registration_date').to_frame()
+    gender_count = dashboards.PATIENTS_BY_GENDER.refresh(DB_FILE, CHARTS).rename_axis('gender').to_frame()
     doctors = get_data("Doctors")
-    bills = get_data("Billings")
+    status_count = aggregates.status_counts()
+    revenue = aggregates.monthly_revenue().rename_axis('bill_date')
 
     st.markdown("### 📊 Hospital Overview Dashboard")
 
     col1, col2 = st.columns(2)
     with col1:
         # Patients Growth Over Time
-        if not patients.empty:
-            patients['registration_date'] = pd.to_datetime(patients['registration_date'])
-            growth = patients.groupby(patients['registration_date'].dt.strftime('%Y-%m')).size().reset_index(name='Count')
-            growth = growth.set_index('registration_date')
+        if not growth.empty:
             st.subheader("📈 New Patients Over Time")
             st.line_chart(growth)
         else:
             st.info("No patient registrations yet")
 
         # Gender Distribution
-        if not patients.empty:
-            gender_count = patients['gender'].value_counts().to_frame(name='Count')
+        if not gender_count.empty:
             st.subheader("👥 Patient Gender Distribution")
             st.bar_chart(gender_count)
         else:
@@ -146,28 +92,24 @@ def show_home_charts():
 
     with col2:
         # Appointments by Status
-        if not appointments.empty:
-            status_count = appointments['status'].value_counts().to_frame(name='Count')
+        if not status_count.empty:
             st.subheader("🗓️ Appointments by Status")
             st.bar_chart(status_count)
         else:
             st.info("No appointments yet")
 
         # Monthly Revenue
-        if not bills.empty:
-            bills['bill_date'] = pd.to_datetime(bills['bill_date'])
-            revenue = bills.groupby(bills['bill_date'].dt.strftime('%Y-%m'))['amount'].sum().reset_index()
-            revenue = revenue.set_index('bill_date')['amount'].to_frame()
+        if not revenue.empty:
             st.subheader("💰 Monthly Revenue")
             st.area_chart(revenue)
         else:
             st.info("No billing data yet")
 
     # Top Busy Doctors
-    if not appointments.empty and not doctors.empty:
-        busy = appointments['doc_id'].value_counts().head(6).reset_index()
-        busy = busy.merge(doctors[['doc_id', 'name']], on='doc_id')
-        busy = busy.set_index('name')['count'].to_frame()
+    busy = aggregates.appointments_by_doctor().head(6)
+    if not busy.empty and not doctors.empty:
+        busy = busy.merge(doctors[['doc_id', 'name']], left_on='doctor', right_on='doc_id')
+        busy = busy.set_index('name')[['Appointments']]
         st.subheader("🏆 Top 6 Busy Doctors")
         st.bar_chart(busy)
 
@@ -185,16 +127,16 @@ if choice == "🏠 Home":
     st.markdown('<div class="big-title">🏥 Hospital Management System</div>', unsafe_allow_html=True)
     st.markdown("<p style='text-align: center; font-size: 1.3rem;'>Modern dashboard with live native charts</p>", unsafe_allow_html=True)
     
+    totals = kpis.dashboard_kpis(db.connection(DB_FILE))
     col1, col2, col3, col4 = st.columns(4)
     with col1:
-        st.metric("Total Patients", len(get_data("Patients")))
+        st.metric("Total Patients", totals.patients)
     with col2:
-        st.metric("Doctors", len(get_data("Doctors")))
+        st.metric("Doctors", totals.doctors)
     with col3:
-        st.metric("Appointments", len(get_data("Appointments")))
+        st.metric("Appointments", totals.appointments)
     with col4:
-        total_rev = get_data("Billings")['amount'].sum()
-        st.metric("Total Revenue", f"${total_rev:,.2f}")
+        st.metric("Total Revenue", f"${totals.revenue:,.2f}")
 
     show_home_charts()
 
@@ -206,8 +148,20 @@ elif choice == "👥 Patients":
     with tab1:
         # View, Delete, Update (same as before)
         search_query = st.text_input("🔍 Search by Name or Phone")
-        df = get_data("Patients") if not search_query else get_data("Patients")[get_data("Patients")['name'].str.contains(search_query, case=False) | get_data("Patients")['phone'].str.contains(search_query)]
-        st.dataframe(df, use_container_width=True)
+        if search_query:
+            conn = db.connection(DB_FILE)
+            matches = fulltext.count_matches(conn, CHARTS, "Patients", search_query)
+            pages = max(1, -(-matches // SEARCH_PAGE_SIZE))
+            page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, step=1)
+            df = fulltext.search(conn, CHARTS, "Patients", search_query,
+                                 limit=SEARCH_PAGE_SIZE, offset=(page - 1) * SEARCH_PAGE_SIZE)
+            st.caption(f"{matches} matching patients")
+            st.dataframe(df, use_container_width=True)
+        else:
+            grid.data_grid(db.connection(DB_FILE), "Patients", "pat_id", key="patients",
+                           sort_columns=["name", "age", "registration_date"],
+                           filter_columns=["gender", "address", "email"],
+                           use_container_width=True)
 
         col_del, col_up = st.columns(2)
         with col_del:
@@ -250,17 +204,17 @@ elif choice == "👥 Patients":
                     st.success("Patient added!")
                     st.rerun()
 
+        with st.expander("📥 Bulk Import from CSV/Excel"):
+            importer.import_widget(DB_FILE, CHARTS, "Patients", key="import_patients")
+
     with tab3:
-        patients = get_data("Patients")
-        if not patients.empty:
+        monthly = dashboards.PATIENTS_BY_MONTH.refresh(DB_FILE, CHARTS).rename_axis('registration_date').to_frame()
+        if not monthly.empty:
             st.subheader("Age Distribution")
-            age_bins = pd.cut(patients['age'], bins=[0,18,35,50,65,120], labels=["0-18","19-35","36-50","51-65","65+"])
-            age_dist = age_bins.value_counts().sort_index().to_frame()
+            age_dist = dashboards.PATIENTS_BY_AGE.refresh(DB_FILE, CHARTS).reindex(dashboards.AGE_GROUPS, fill_value=0).rename_axis('age').to_frame()
             st.bar_chart(age_dist)
 
             st.subheader("Registrations Over Time")
-            patients['registration_date'] = pd.to_datetime(patients['registration_date'])
-            monthly = patients.groupby(patients['registration_date'].dt.strftime('%Y-%m')).size().to_frame(name='Count')
             st.line_chart(monthly)
 
 # (Repeat similar pattern for other modules with their own stats tab if desired)
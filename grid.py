@@ -0,0 +1,140 @@
+"""Keyset-paginated table listing for Streamlit pages.
+
+Instead of shipping ``SELECT * FROM table`` to the browser, ``data_grid()``
+fetches one page at a time with ``WHERE (sort, key) > (last row) LIMIT n``,
+so every page costs the same no matter how deep the user pages.  That
+needs an index on ``(sort, key)`` for every sort column a page offers
+(see the grid_indexes migrations).  Sorting and filtering happen in SQL;
+the total comes from the RowCounts rollup.
+"""
+import pandas as pd
+import streamlit as st
+
+import rollups
+
+PAGE_SIZES = (25, 50, 100, 250)
+NO_FILTER = "(none)"
+
+
+def _after(sort, key, descending, cursor):
+    """WHERE clause selecting rows that come after ``cursor`` = (sort value, key value).
+
+    The leading bound on ``sort`` lets SQLite seek the (sort, key) index
+    instead of walking it from the start.  SQLite sorts NULLs first
+    ascending and last descending, so a NULL cursor value needs its own
+    condition, and the NULLs after a descending non-NULL cursor are left
+    to fetch_page().
+    """
+    value, last_key = cursor
+    if sort == key:
+        return (f"{key} < ?" if descending else f"{key} > ?"), [last_key]
+    if descending:
+        if value is None:
+            return f"({sort} IS NULL AND {key} < ?)", [last_key]
+        return f"({sort} <= ? AND ({sort} < ? OR {key} < ?))", [value, value, last_key]
+    if value is None:
+        return f"(({sort} IS NULL AND {key} > ?) OR {sort} IS NOT NULL)", [last_key]
+    return f"({sort} >= ? AND ({sort} > ? OR {key} > ?))", [value, value, last_key]
+
+
+def _contains(column, text):
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"{column} LIKE ? ESCAPE '\\'", [f"%{escaped}%"]
+
+
+def fetch_page(conn, table, key, sort=None, descending=False, cursor=None,
+               limit=50, filter_column=None, filter_text=""):
+    """One page of ``table`` ordered by (sort, key), starting after ``cursor``."""
+    sort = sort or key
+    filters, params = [], []
+    if filter_column and filter_text:
+        clause, args = _contains(filter_column, filter_text)
+        filters.append(clause)
+        params += args
+
+    def select(clauses, args, order, limit):
+        where = f" WHERE {' AND '.join(filters + clauses)}" if filters or clauses else ""
+        return pd.read_sql(f"SELECT * FROM {table}{where} ORDER BY {order} LIMIT ?",
+                           conn, params=params + args + [limit])
+
+    clauses, args = [], []
+    if cursor is not None:
+        clause, args = _after(sort, key, descending, cursor)
+        clauses.append(clause)
+    direction = "DESC" if descending else "ASC"
+    order = f"{key} {direction}" if sort == key else f"{sort} {direction}, {key} {direction}"
+    page = select(clauses, args, order, limit)
+    if descending and sort != key and cursor is not None and cursor[0] is not None and len(page) < limit:
+        nulls = select([f"{sort} IS NULL"], [], f"{key} DESC", limit - len(page))
+        if len(nulls):
+            page = pd.concat([page, nulls], ignore_index=True) if len(page) else nulls
+    return page
+
+
+def total_rows(conn, table):
+    """Row count from the RowCounts rollup, or COUNT(*) for tables it does not track."""
+    counts = rollups.row_counts(conn)
+    if table in counts:
+        return counts[table]
+    return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def _scalar(value):
+    """Plain Python value for a DataFrame cell, so it binds as a SQL parameter."""
+    if pd.isna(value):
+        return None
+    return value.item() if hasattr(value, "item") else value
+
+
+def _go_next(state, cursor):
+    state["cursors"].append(cursor)
+
+
+def _go_back(state):
+    state["cursors"].pop()
+
+
+def data_grid(conn, table, key_column, key, sort_columns=(), filter_columns=(),
+              page_size=50, **dataframe_kwargs):
+    """Render a paginated, sortable, filterable listing of ``table``.
+
+    ``key`` namespaces the widgets so several grids can share a page.
+    Extra keyword arguments go to ``st.dataframe``.
+    """
+    state = st.session_state.setdefault(f"{key}_grid", {"signature": None, "cursors": []})
+
+    controls = st.columns(4 if filter_columns else 2)
+    sort = controls[0].selectbox("Sort by", [key_column, *sort_columns], key=f"{key}_sort")
+    descending = controls[1].checkbox("Descending", key=f"{key}_desc")
+    filter_column, filter_text = None, ""
+    if filter_columns:
+        filter_column = controls[2].selectbox("Filter on", [NO_FILTER, *filter_columns], key=f"{key}_fcol")
+        filter_text = controls[3].text_input("Contains", key=f"{key}_ftext")
+        if filter_column == NO_FILTER:
+            filter_column = None
+    sizes = sorted({*PAGE_SIZES, page_size})
+    size = st.selectbox("Rows per page", sizes, index=sizes.index(page_size), key=f"{key}_size")
+
+    # Any change to the ordering or filter starts again from the first page.
+    signature = (sort, descending, filter_column, filter_text, size)
+    if state["signature"] != signature:
+        state["signature"], state["cursors"] = signature, []
+
+    cursor = state["cursors"][-1] if state["cursors"] else None
+    page = fetch_page(conn, table, key_column, sort, descending, cursor, size + 1,
+                      filter_column, filter_text)
+    has_next = len(page) > size
+    page = page.iloc[:size]
+    st.dataframe(page, **dataframe_kwargs)
+
+    prev_col, info_col, next_col = st.columns([1, 3, 1])
+    prev_col.button("◀ Previous", key=f"{key}_prev", disabled=not state["cursors"],
+                    on_click=_go_back, args=(state,))
+    next_cursor = None
+    if has_next:
+        last = page.iloc[-1]
+        next_cursor = (_scalar(last[sort]), _scalar(last[key_column]))
+    next_col.button("Next ▶", key=f"{key}_next", disabled=not has_next,
+                    on_click=_go_next, args=(state, next_cursor))
+    total = "" if filter_column and filter_text else f" of {total_rows(conn, table)} rows"
+    info_col.caption(f"Page {len(state['cursors']) + 1} · showing {len(page)}{total}")
@@ -0,0 +1,240 @@
+"""Bulk CSV/Excel import for patients, doctors, appointments and billings.
+
+The file is read in chunks.  Each chunk is validated with vectorized pandas
+operations, deduplicated against the database with one set-based query,
+and inserted with ``executemany`` as one transaction on the writer
+thread.  Rejected rows are written, with their line number and reason,
+to a rejection CSV.
+
+    python importer.py patients.csv --table Patients --layout management
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from typing import NamedTuple, Optional
+
+import pandas as pd
+
+import cnics
+import db
+import writer
+from layouts import LAYOUTS
+
+CHUNK_SIZE = 10_000
+
+
+class ImportSpec(NamedTuple):
+    columns: tuple            # inserted columns; the file header must have them
+    required: tuple = ()      # must be non-empty
+    cnic_columns: tuple = ()  # normalized, then must look like xxxxx-xxxxxxx-x
+    unique: Optional[str] = None  # UNIQUE column to dedupe on
+    dates: tuple = ()
+    numbers: tuple = ()
+
+
+SPECS = {
+    "management": {
+        "Patients": ImportSpec(("name", "cnic", "phone"), ("name", "cnic"), ("cnic",), "cnic"),
+        "Doctors": ImportSpec(("name", "cnic", "department"), ("name", "cnic"), ("cnic",), "cnic"),
+        "Appointments": ImportSpec(
+            ("patient", "patient_cnic", "doctor", "doctor_cnic", "date", "time", "status"),
+            ("patient_cnic", "doctor_cnic", "date"), ("patient_cnic", "doctor_cnic"), dates=("date",)),
+        "Billings": ImportSpec(
+            ("patient", "patient_cnic", "amount", "details", "status"),
+            ("patient_cnic", "amount"), ("patient_cnic",), numbers=("amount",)),
+    },
+    "front_desk": {
+        "Patients": ImportSpec(("name", "cnic", "phone"), ("name", "cnic"), ("cnic",), "cnic"),
+        "Doctors": ImportSpec(("name", "cnic", "specialty"), ("name", "cnic"), ("cnic",), "cnic"),
+        "Appointments": ImportSpec(("patient", "doctor", "date", "time", "status"),
+                                   ("patient", "doctor", "date"), dates=("date",)),
+    },
+    "charts": {
+        "Patients": ImportSpec(("name", "age", "gender", "phone", "address", "email"),
+                               ("name", "phone"), numbers=("age",)),
+        "Doctors": ImportSpec(("name", "specialty", "dept_id", "phone", "email"), ("name",),
+                              numbers=("dept_id",)),
+        "Appointments": ImportSpec(("pat_id", "doc_id", "app_date", "app_time", "status"),
+                                   ("pat_id", "doc_id", "app_date"),
+                                   dates=("app_date",), numbers=("pat_id", "doc_id")),
+        "Billings": ImportSpec(("pat_id", "amount", "details", "payment_status", "bill_date"),
+                               ("pat_id", "amount"), dates=("bill_date",), numbers=("pat_id", "amount")),
+    },
+}
+
+
+class ImportReport(NamedTuple):
+    table: str
+    rows_read: int
+    inserted: int
+    rejected: int
+    skipped: int  # valid rows another session inserted first
+    seconds: float
+
+    @property
+    def rows_per_second(self):
+        return self.rows_read / self.seconds if self.seconds else 0.0
+
+
+def read_chunks(source, filename=None, chunk_size=CHUNK_SIZE):
+    """Yield DataFrames of at most ``chunk_size`` rows, every column as str.
+
+    CSV is streamed; Excel files cannot be read incrementally, so they are
+    loaded once and sliced.
+    """
+    name = (filename or (source if isinstance(source, str) else getattr(source, "name", ""))).lower()
+    if name.endswith((".xlsx", ".xls")):
+        frame = pd.read_excel(source, dtype=str)
+        for start in range(0, len(frame), chunk_size):
+            yield frame.iloc[start:start + chunk_size]
+    else:
+        yield from pd.read_csv(source, dtype=str, chunksize=chunk_size, skipinitialspace=True)
+
+
+def _validate(chunk, spec):
+    """Return (clean rows, reasons): a Series of rejection reasons per bad row."""
+    chunk = chunk.apply(lambda col: col.str.strip())
+    reasons = pd.Series("", index=chunk.index)
+
+    def reject(mask, reason):
+        reasons[mask & (reasons == "")] = reason
+
+    for col in spec.required:
+        reject(chunk[col].isna() | (chunk[col] == ""), f"missing {col}")
+    for col in spec.cnic_columns:
+        chunk[col] = cnics.normalize(chunk[col])
+        reject(chunk[col].notna() & ~cnics.is_valid(chunk[col]), f"invalid {col}")
+    for col in spec.dates:
+        parsed = pd.to_datetime(chunk[col], errors="coerce", format="mixed")
+        reject(chunk[col].notna() & parsed.isna(), f"invalid {col}")
+        chunk[col] = parsed.dt.strftime("%Y-%m-%d")
+    for col in spec.numbers:
+        parsed = pd.to_numeric(chunk[col], errors="coerce")
+        reject(chunk[col].notna() & parsed.isna(), f"invalid {col}")
+        chunk[col] = parsed
+    return chunk, reasons
+
+
+def _existing(conn, table, column, values):
+    """Subset of ``values`` already present in ``table.column``, in one query."""
+    rows = conn.execute(
+        f"SELECT {column} FROM {table} WHERE {column} IN (SELECT value FROM json_each(?))",
+        (json.dumps(list(values)),),
+    )
+    return {value for (value,) in rows}
+
+
+def import_file(db_path, layout, table, source, filename=None, chunk_size=CHUNK_SIZE, rejects=None):
+    """Import ``source`` into ``table``; write rejected rows as CSV to ``rejects``.
+
+    ``source`` is a path or file object; ``rejects`` a path, a text file
+    object, or None to drop them.
+    """
+    spec = SPECS[layout.name][table]
+    conn = db.connection(db_path)
+    queue = writer.get_writer(db_path)
+    sql = (f"INSERT OR IGNORE INTO {table} ({', '.join(spec.columns)}) "
+           f"VALUES ({', '.join('?' * len(spec.columns))})")
+
+    out = open(rejects, "w", newline="") if isinstance(rejects, str) else rejects
+    reject_writer = csv.writer(out) if out is not None else None
+    if reject_writer:
+        reject_writer.writerow(["line", "reason", *spec.columns])
+
+    seen = set()
+    read = inserted = rejected = skipped = 0
+    started = time.perf_counter()
+    try:
+        for chunk in read_chunks(source, filename, chunk_size):
+            missing = [col for col in spec.columns if col not in chunk.columns]
+            if missing:
+                raise ValueError(f"{table} import is missing columns: {', '.join(missing)}")
+            # Header is line 1, so data row i is on line i + 2.
+            lines = chunk.index + 2
+            raw = chunk[list(spec.columns)]
+            chunk, reasons = _validate(raw.copy(), spec)
+
+            if spec.unique:
+                keys = chunk[spec.unique]
+                ok = reasons == ""
+                # seen grows with the file; probe the set rather than isin() it.
+                reasons[ok & keys.map(seen.__contains__).astype(bool)] = f"duplicate {spec.unique} in file"
+                # Only rows still accepted count: a rejected row must not shadow a later valid one.
+                ok = reasons == ""
+                dup = keys[ok].duplicated()
+                reasons[dup[dup].index] = f"duplicate {spec.unique} in file"
+                ok = reasons == ""
+                taken = _existing(conn, table, spec.unique, keys[ok].unique().tolist())
+                reasons[ok & keys.isin(taken)] = f"{spec.unique} already exists"
+                seen.update(keys[reasons == ""])
+
+            good = reasons == ""
+            rows = chunk[good].astype(object)
+            rows = rows.where(rows.notna(), None)
+            if len(rows):
+                changed = queue.submit_many(sql, list(rows.itertuples(index=False, name=None))).result()
+                inserted += changed
+                skipped += len(rows) - changed
+            bad = ~good
+            if reject_writer and bad.any():
+                for line, reason, values in zip(lines[bad], reasons[bad], raw[bad].fillna("").itertuples(index=False)):
+                    reject_writer.writerow([line, reason, *values])
+            read += len(chunk)
+            rejected += int(bad.sum())
+    finally:
+        if isinstance(rejects, str):
+            out.close()
+    return ImportReport(table, read, inserted, rejected, skipped, time.perf_counter() - started)
+
+
+def import_widget(db_path, layout, table, key):
+    """Streamlit file uploader that runs import_file() and offers the rejects."""
+    import streamlit as st
+
+    upload = st.file_uploader(f"CSV or Excel file of {table.lower()}", type=["csv", "xlsx", "xls"], key=key)
+    if upload is None or not st.button(f"Import {table}", key=f"{key}_run"):
+        return None
+    rejects = io.StringIO()
+    try:
+        report = import_file(db_path, layout, table, upload, upload.name, rejects=rejects)
+    except ValueError as exc:
+        st.error(f"⚠️ {exc}")
+        return None
+    st.success(f"✅ Imported {report.inserted} of {report.rows_read} rows "
+               f"in {report.seconds:.1f}s ({report.rows_per_second:,.0f} rows/s)")
+    if report.rejected:
+        st.warning(f"{report.rejected} rows rejected")
+        st.download_button("Download rejected rows", rejects.getvalue(),
+                           f"{table.lower()}_rejects.csv", "text/csv", key=f"{key}_rejects")
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import a CSV or Excel file.")
+    parser.add_argument("file")
+    parser.add_argument("--table", required=True, choices=["Patients", "Doctors", "Appointments", "Billings"])
+    parser.add_argument("--db", default="hospital.db")
+    parser.add_argument("--layout", choices=sorted(LAYOUTS), default="management")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--rejects", help="rejection CSV (default: <file>.rejects.csv)")
+    args = parser.parse_args(argv)
+
+    layout = LAYOUTS[args.layout]
+    if args.table not in SPECS[layout.name]:
+        parser.error(f"the {layout.name} layout has no {args.table} table")
+    rejects = args.rejects or f"{os.path.splitext(args.file)[0]}.rejects.csv"
+    report = import_file(args.db, layout, args.table, args.file, chunk_size=args.chunk_size, rejects=rejects)
+    print(f"{report.table}: read {report.rows_read}, inserted {report.inserted}, "
+          f"rejected {report.rejected}, skipped {report.skipped} "
+          f"in {report.seconds:.2f}s ({report.rows_per_second:,.0f} rows/s)")
+    if report.rejected:
+        print(f"Rejected rows written to {rejects}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
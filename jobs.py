@@ -0,0 +1,230 @@
+"""Background PDF report jobs rendered in a process pool.
+
+``submit()`` records a job in the ``ReportJobs`` table (created by
+migrations.py) and hands it to a process-wide ``ProcessPoolExecutor``;
+the worker reads the database itself, so only the job parameters and the
+finished PDF cross process boundaries.  When a worker finishes, the PDF (or the error) is stored on
+the job row through the writer queue, where any session can pick it up.
+Page reruns never wait on reportlab.
+
+``HOSPITAL_REPORT_WORKERS`` sets the pool size (default: one per core).
+"""
+import atexit
+import contextlib
+import functools
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import types
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+
+import db
+import writer
+
+KEEP_FOR = timedelta(days=1)  # finished jobs, and their PDFs, are pruned after this
+POLL_SECONDS = 2
+
+
+class Job(NamedTuple):
+    id: int
+    kind: str
+    filename: str
+    status: str
+    error: Optional[str]
+    created_at: str
+    finished_at: Optional[str]
+
+    @property
+    def pending(self):
+        return self.status in ("queued", "running")
+
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+# ================= WORKER SIDE =================
+# reports and slips import reportlab, so they are only imported in here:
+# the pages importing this module never render a PDF themselves.
+def _table_report(conn, table, title=None):
+    import reports
+
+    if not table.isidentifier():
+        raise ValueError(f"not a table name: {table!r}")
+    return reports.query_pdf(conn, f"SELECT * FROM {table}", title=title or table).getvalue()
+
+
+def _slips(conn, start=None, end=None, doctor=None):
+    import slips
+
+    pdf = slips.batch_pdf(conn, start, end, doctor)
+    if pdf is None:
+        raise LookupError("no appointments match")
+    return pdf
+
+
+RENDERERS = {
+    "table": _table_report,
+    "slips": _slips,
+}
+
+
+def _render(db_path, job_id, kind, params):
+    conn = db.connection(db_path)
+    with conn:
+        conn.execute("UPDATE ReportJobs SET status = 'running', started_at = ? WHERE id = ?", (_now(), job_id))
+    return RENDERERS[kind](conn, **params)
+
+
+# ================= SUBMITTING SIDE =================
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _executor():
+    # Called with _pool_lock held.
+    global _pool
+    if _pool is None:
+        workers = int(os.environ.get("HOSPITAL_REPORT_WORKERS", 0)) or None
+        # spawn, not fork: this process runs the writer and Streamlit threads.
+        _pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+_PLAIN_MAIN = types.ModuleType("__main__")
+
+
+@contextlib.contextmanager
+def _plain_main():
+    """Hide the page script from workers spawned inside the block.
+
+    Streamlit runs the page as ``__main__`` and spawn re-imports
+    ``__main__`` in each new worker, which would run the whole app there.
+    """
+    script = sys.modules["__main__"]
+    sys.modules["__main__"] = _PLAIN_MAIN
+    try:
+        yield
+    finally:
+        # Another script run may have installed its own __main__ meanwhile.
+        if sys.modules["__main__"] is _PLAIN_MAIN:
+            sys.modules["__main__"] = script
+
+
+def _start(db_path, job_id, kind, params):
+    # Workers are spawned lazily by submit(), so that is what gets wrapped.
+    with _pool_lock, _plain_main():
+        return _executor().submit(_render, db_path, job_id, kind, params)
+
+
+def _finish(db_path, job_id, future):
+    queue = writer.get_writer(db_path)
+    try:
+        pdf = future.result()
+    except Exception as exc:  # noqa: BLE001 - recorded on the job instead
+        queue.submit("UPDATE ReportJobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ?",
+                     (f"{type(exc).__name__}: {exc}", _now(), job_id))
+    else:
+        queue.submit("UPDATE ReportJobs SET status = 'done', pdf = ?, finished_at = ? WHERE id = ?",
+                     (pdf, _now(), job_id))
+
+
+def submit(db_path, kind, params=None, filename="report.pdf"):
+    """Queue a report and return its job id without waiting for the render."""
+    global _pool
+    if kind not in RENDERERS:
+        raise ValueError(f"unknown report kind {kind!r}; expected one of {sorted(RENDERERS)}")
+    params = params or {}
+    queue = writer.get_writer(db_path)
+    queue.submit("DELETE FROM ReportJobs WHERE finished_at < ?",
+                 ((datetime.now() - KEEP_FOR).isoformat(timespec="seconds"),))
+    job_id = queue.execute(
+        "INSERT INTO ReportJobs(kind, params, filename, status, created_at) VALUES (?, ?, ?, 'queued', ?)",
+        (kind, json.dumps(params), filename, _now()),
+    )
+    try:
+        future = _start(db_path, job_id, kind, params)
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory); start a fresh pool once.
+        with _pool_lock:
+            _pool = None
+        future = _start(db_path, job_id, kind, params)
+    future.add_done_callback(functools.partial(_finish, db_path, job_id))
+    return job_id
+
+
+def get(db_path, job_id):
+    row = db.connection(db_path).execute(
+        "SELECT id, kind, filename, status, error, created_at, finished_at FROM ReportJobs WHERE id = ?",
+        (job_id,),
+    ).fetchone()
+    return Job(*row) if row else None
+
+
+def result(db_path, job_id):
+    """The finished PDF as bytes, or None while the job is pending or failed."""
+    row = db.connection(db_path).execute(
+        "SELECT pdf FROM ReportJobs WHERE id = ? AND status = 'done'", (job_id,)
+    ).fetchone()
+    return row[0] if row else None
+
+
+def shutdown(wait=True):
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=wait, cancel_futures=True)
+
+
+# Registered after writer's handler, so it runs first and results still get written.
+atexit.register(shutdown)
+
+
+# ================= STREAMLIT =================
+def request(db_path, key, kind, params=None, filename="report.pdf"):
+    """submit() and remember the job in this session under ``key``."""
+    import streamlit as st
+
+    job_id = submit(db_path, kind, params, filename)
+    st.session_state.setdefault(key, []).append(job_id)
+    return job_id
+
+
+def jobs_panel(db_path, key):
+    """This session's report jobs under ``key``, with a download button once done.
+
+    Finished jobs are listed with the page, so their PDFs are read once per
+    page run.  Pending ones are shown in a fragment that polls every couple
+    of seconds, only while there are any, without rerunning the rest of the
+    page; when one finishes, the page reruns to list it as finished.
+    """
+    import streamlit as st
+
+    jobs = [job for job in (get(db_path, job_id) for job_id in reversed(st.session_state.get(key, [])))
+            if job is not None]
+    waiting = [job.id for job in jobs if job.pending]
+
+    @st.fragment(run_every=POLL_SECONDS)
+    def pending():
+        current = [get(db_path, job_id) for job_id in waiting]
+        if any(job is None or not job.pending for job in current):
+            st.rerun()
+        for job in current:
+            st.info(f"⏳ {job.filename}: {job.status}")
+
+    if waiting:
+        pending()
+    for job in jobs:
+        if job.pending:
+            continue
+        if job.status == "failed":
+            st.error(f"⚠️ {job.filename}: {job.error}")
+        else:
+            st.download_button(f"⬇️ {job.filename}", result(db_path, job.id), job.filename,
+                               "application/pdf", key=f"{key}_{job.id}")
@@ -0,0 +1,43 @@
+"""Headline dashboard metrics computed in SQL instead of pandas."""
+from typing import NamedTuple
+
+
+class DashboardKpis(NamedTuple):
+    patients: int
+    doctors: int
+    appointments: int
+    revenue: float
+
+
+# Reads the trigger-maintained tables from rollups.py: a handful of rows.
+KPI_SQL = """
+    SELECT
+        (SELECT COALESCE(MAX(n), 0) FROM RowCounts WHERE tbl = 'Patients'),
+        (SELECT COALESCE(MAX(n), 0) FROM RowCounts WHERE tbl = 'Doctors'),
+        (SELECT COALESCE(MAX(n), 0) FROM RowCounts WHERE tbl = 'Appointments'),
+        (SELECT COALESCE(SUM(amount), 0) FROM MonthlyRevenue)
+"""
+
+# Same metrics straight from the base tables, for checking the rollups.
+LIVE_KPI_SQL = """
+    SELECT
+        (SELECT COUNT(*) FROM Patients),
+        (SELECT COUNT(*) FROM Doctors),
+        (SELECT COUNT(*) FROM Appointments),
+        (SELECT COALESCE(SUM(amount), 0) FROM Billings)
+"""
+
+
+def _kpis(conn, sql):
+    patients, doctors, appointments, revenue = conn.execute(sql).fetchone()
+    return DashboardKpis(patients, doctors, appointments, float(revenue))
+
+
+def dashboard_kpis(conn):
+    """Return patient/doctor/appointment counts and total revenue in one query."""
+    return _kpis(conn, KPI_SQL)
+
+
+def live_kpis(conn):
+    """Like dashboard_kpis() but aggregated over the base tables."""
+    return _kpis(conn, LIVE_KPI_SQL)
@@ -0,0 +1,69 @@
+"""Column names each app's schema uses, for the shared database modules.
+
+App.py, app.py and graphs.py create differently shaped tables under the
+same names, so modules that install triggers or build SQL against those
+tables take one of the layouts below instead of hard-coding columns.
+"""
+from typing import NamedTuple, Optional
+
+
+class Layout(NamedTuple):
+    name: str
+    primary_keys: dict  # table -> id column, for every table the app creates
+    appointment_date: str
+    appointment_doctor: str
+    billing_date: Optional[str]
+
+    @property
+    def tables(self):
+        return tuple(self.primary_keys)
+
+    def has(self, table):
+        return table in self.primary_keys
+
+
+# App.py
+MANAGEMENT = Layout(
+    name="management",
+    primary_keys={
+        "Patients": "id",
+        "Departments": "id",
+        "Doctors": "id",
+        "Appointments": "id",
+        "Billings": "id",
+    },
+    appointment_date="date",
+    appointment_doctor="doctor",
+    billing_date=None,
+)
+
+# app.py
+FRONT_DESK = Layout(
+    name="front_desk",
+    primary_keys={
+        "Users": "username",
+        "Patients": "id",
+        "Doctors": "id",
+        "Appointments": "id",
+    },
+    appointment_date="date",
+    appointment_doctor="doctor",
+    billing_date=None,
+)
+
+# graphs.py
+CHARTS = Layout(
+    name="charts",
+    primary_keys={
+        "Patients": "pat_id",
+        "Doctors": "doc_id",
+        "Appointments": "app_id",
+        "MedicalRecords": "record_id",
+        "Billings": "bill_id",
+    },
+    appointment_date="app_date",
+    appointment_doctor="doc_id",
+    billing_date="bill_date",
+)
+
+LAYOUTS = {layout.name: layout for layout in (MANAGEMENT, FRONT_DESK, CHARTS)}
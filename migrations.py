@@ -0,0 +1,409 @@
+"""Versioned schema migrations for the hospital database.
+
+Each app has its own ordered chain of migrations (keyed by layout name),
+and applied versions are recorded per app in ``schema_version``.
+``migrate()`` replaces the old ``init_db()`` functions.  Migrations only
+use ``IF NOT EXISTS`` DDL so re-running one after a crash is harmless.
+The apps call ``ensure()``, which migrates once per process and database
+file and afterwards only compares a schema fingerprint on each rerun.
+
+``python migrations.py check-plans`` runs EXPLAIN QUERY PLAN over the hot
+queries registered below and fails if any of them scans a whole table.
+"""
+import argparse
+import os
+import sys
+import threading
+from datetime import datetime
+from typing import Callable, NamedTuple, Union
+
+import cache
+import changes
+import db
+import fulltext
+import rollups
+from layouts import LAYOUTS
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    apply: Union[str, Callable]  # SQL script, or fn(conn, layout)
+
+
+VERSION_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_version(
+        app TEXT NOT NULL,
+        version INTEGER NOT NULL,
+        name TEXT,
+        applied_at TEXT,
+        PRIMARY KEY(app, version)
+    );
+"""
+
+
+# Background PDF renders; see jobs.py.
+REPORT_JOBS = """
+    CREATE TABLE IF NOT EXISTS ReportJobs(
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind TEXT NOT NULL,
+        params TEXT,
+        filename TEXT,
+        status TEXT NOT NULL DEFAULT 'queued',  -- queued, running, done, failed
+        error TEXT,
+        pdf BLOB,
+        created_at TEXT,
+        started_at TEXT,
+        finished_at TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_report_jobs_created ON ReportJobs(created_at);
+"""
+
+
+def _install_rollups(conn, layout):
+    rollups.install(conn, layout)
+
+
+def _install_search(conn, layout):
+    fulltext.install(conn, layout)
+
+
+def _install_table_versions(conn, layout):
+    cache.install(conn, layout)
+
+
+def _install_change_log(conn, layout):
+    changes.install(conn, layout)
+
+
+# ================= App.py =================
+MANAGEMENT_MIGRATIONS = [
+    Migration(1, "baseline", """
+        CREATE TABLE IF NOT EXISTS Patients(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT,
+            cnic TEXT UNIQUE,
+            phone TEXT
+        );
+        CREATE TABLE IF NOT EXISTS Departments(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE
+        );
+        CREATE TABLE IF NOT EXISTS Doctors(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT,
+            cnic TEXT UNIQUE,
+            department TEXT
+        );
+        CREATE TABLE IF NOT EXISTS Appointments(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            patient TEXT,
+            patient_cnic TEXT,
+            doctor TEXT,
+            doctor_cnic TEXT,
+            date TEXT,
+            time TEXT,
+            status TEXT
+        );
+        CREATE TABLE IF NOT EXISTS Billings(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            patient TEXT,
+            patient_cnic TEXT,
+            amount REAL,
+            details TEXT,
+            status TEXT
+        );
+        -- Default departments
+        INSERT OR IGNORE INTO Departments(name) VALUES ('Cardiology'),('Neurology'),('Orthopedics');
+    """),
+    Migration(2, "rollups", _install_rollups),
+    Migration(3, "appointment_indexes", """
+        CREATE INDEX IF NOT EXISTS idx_appointments_date ON Appointments(date);
+        CREATE INDEX IF NOT EXISTS idx_appointments_doctor_date ON Appointments(doctor, date);
+        CREATE INDEX IF NOT EXISTS idx_appointments_doctor_cnic_date ON Appointments(doctor_cnic, date);
+        CREATE INDEX IF NOT EXISTS idx_appointments_patient_cnic_date ON Appointments(patient_cnic, date);
+        CREATE INDEX IF NOT EXISTS idx_appointments_status_date ON Appointments(status, date);
+    """),
+    Migration(4, "billing_indexes", """
+        CREATE INDEX IF NOT EXISTS idx_billings_patient_cnic ON Billings(patient_cnic);
+    """),
+    Migration(5, "search_index", _install_search),
+    Migration(6, "table_versions", _install_table_versions),
+    Migration(7, "report_jobs", REPORT_JOBS),
+    Migration(8, "change_log", _install_change_log),
+    Migration(9, "change_log_old_rows", _install_change_log),
+    Migration(10, "grid_indexes", """
+        CREATE INDEX IF NOT EXISTS idx_patients_name_id ON Patients(name, id);
+        CREATE INDEX IF NOT EXISTS idx_patients_cnic_id ON Patients(cnic, id);
+        CREATE INDEX IF NOT EXISTS idx_doctors_name_id ON Doctors(name, id);
+        CREATE INDEX IF NOT EXISTS idx_doctors_department_id ON Doctors(department, id);
+    """),
+]
+
+# ================= app.py =================
+FRONT_DESK_MIGRATIONS = [
+    Migration(1, "baseline", """
+        CREATE TABLE IF NOT EXISTS Users(
+            username TEXT PRIMARY KEY,
+            password TEXT,
+            role TEXT
+        );
+        CREATE TABLE IF NOT EXISTS Patients(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT,
+            cnic TEXT UNIQUE,
+            phone TEXT
+        );
+        CREATE TABLE IF NOT EXISTS Doctors(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT,
+            cnic TEXT UNIQUE,
+            specialty TEXT
+        );
+        CREATE TABLE IF NOT EXISTS Appointments(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            patient TEXT,
+            doctor TEXT,
+            date TEXT,
+            time TEXT,
+            status TEXT
+        );
+        INSERT OR IGNORE INTO Users VALUES ('admin','admin123','Admin');
+    """),
+    Migration(2, "rollups", _install_rollups),
+    Migration(3, "appointment_indexes", """
+        CREATE INDEX IF NOT EXISTS idx_appointments_date ON Appointments(date);
+        CREATE INDEX IF NOT EXISTS idx_appointments_doctor_date ON Appointments(doctor, date);
+        CREATE INDEX IF NOT EXISTS idx_appointments_patient_date ON Appointments(patient, date);
+        CREATE INDEX IF NOT EXISTS idx_appointments_status_date ON Appointments(status, date);
+    """),
+    Migration(4, "search_index", _install_search),
+    Migration(5, "table_versions", _install_table_versions),
+    Migration(6, "report_jobs", REPORT_JOBS),
+    Migration(7, "change_log", _install_change_log),
+    Migration(8, "change_log_old_rows", _install_change_log),
+    Migration(9, "grid_indexes", """
+        CREATE INDEX IF NOT EXISTS idx_patients_name_id ON Patients(name, id);
+        CREATE INDEX IF NOT EXISTS idx_patients_cnic_id ON Patients(cnic, id);
+        CREATE INDEX IF NOT EXISTS idx_doctors_name_id ON Doctors(name, id);
+        CREATE INDEX IF NOT EXISTS idx_doctors_specialty_id ON Doctors(specialty, id);
+        CREATE INDEX IF NOT EXISTS idx_appointments_date_id ON Appointments(date, id);
+        CREATE INDEX IF NOT EXISTS idx_appointments_doctor_id ON Appointments(doctor, id);
+        CREATE INDEX IF NOT EXISTS idx_appointments_status_id ON Appointments(status, id);
+    """),
+]
+
+# ================= graphs.py =================
+CHARTS_MIGRATIONS = [
+    Migration(1, "baseline", """
+        CREATE TABLE IF NOT EXISTS Patients (
+            pat_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            age INTEGER,
+            gender TEXT,
+            phone TEXT,
+            address TEXT,
+            email TEXT,
+            registration_date TEXT DEFAULT (date('now'))
+        );
+        CREATE TABLE IF NOT EXISTS Doctors (
+            doc_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            specialty TEXT,
+            dept_id INTEGER,
+            phone TEXT,
+            email TEXT
+        );
+        CREATE TABLE IF NOT EXISTS Appointments (
+            app_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            pat_id INTEGER,
+            doc_id INTEGER,
+            app_date TEXT,
+            app_time TEXT,
+            status TEXT DEFAULT 'Scheduled'
+        );
+        CREATE TABLE IF NOT EXISTS MedicalRecords (
+            record_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            pat_id INTEGER,
+            doc_id INTEGER,
+            diagnosis TEXT,
+            treatment TEXT,
+            prescription TEXT
+        );
+        CREATE TABLE IF NOT EXISTS Billings (
+            bill_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            pat_id INTEGER,
+            amount REAL,
+            details TEXT,
+            payment_status TEXT DEFAULT 'Pending',
+            bill_date TEXT DEFAULT (date('now'))
+        );
+    """),
+    Migration(2, "rollups", _install_rollups),
+    Migration(3, "appointment_indexes", """
+        CREATE INDEX IF NOT EXISTS idx_appointments_app_date ON Appointments(app_date);
+        CREATE INDEX IF NOT EXISTS idx_appointments_doc_date ON Appointments(doc_id, app_date);
+        CREATE INDEX IF NOT EXISTS idx_appointments_pat_date ON Appointments(pat_id, app_date);
+        CREATE INDEX IF NOT EXISTS idx_appointments_status_app_date ON Appointments(status, app_date);
+    """),
+    Migration(4, "billing_indexes", """
+        CREATE INDEX IF NOT EXISTS idx_billings_pat_date ON Billings(pat_id, bill_date);
+        CREATE INDEX IF NOT EXISTS idx_billings_bill_date ON Billings(bill_date);
+    """),
+    Migration(5, "search_index", _install_search),
+    Migration(6, "table_versions", _install_table_versions),
+    Migration(7, "change_log", _install_change_log),
+    Migration(8, "change_log_old_rows", _install_change_log),
+    Migration(9, "grid_indexes", """
+        CREATE INDEX IF NOT EXISTS idx_patients_name_pat_id ON Patients(name, pat_id);
+        CREATE INDEX IF NOT EXISTS idx_patients_age_pat_id ON Patients(age, pat_id);
+        CREATE INDEX IF NOT EXISTS idx_patients_registration_date_pat_id ON Patients(registration_date, pat_id);
+    """),
+]
+
+MIGRATIONS = {
+    "management": MANAGEMENT_MIGRATIONS,
+    "front_desk": FRONT_DESK_MIGRATIONS,
+    "charts": CHARTS_MIGRATIONS,
+}
+
+
+# ================= HOT QUERIES =================
+def _grid_pages(table, key, sort_columns):
+    """First page of each grid.data_grid() ordering; later pages seek the same index."""
+    return [(f"{table.lower()}_by_{column}", f"SELECT * FROM {table} ORDER BY {column}, {key} LIMIT 50", ())
+            for column in sort_columns]
+
+
+# (name, sql, params) per layout; every one of these must be served by an index.
+HOT_QUERIES = {
+    "management": [
+        ("appointments_in_range", "SELECT * FROM Appointments WHERE date BETWEEN ? AND ?", ("2024-01-01", "2024-12-31")),
+        ("appointments_for_doctor", "SELECT * FROM Appointments WHERE doctor = ? ORDER BY date", ("x",)),
+        ("appointments_for_doctor_cnic", "SELECT * FROM Appointments WHERE doctor_cnic = ? AND date >= ?", ("x", "2024-01-01")),
+        ("appointments_for_patient_cnic", "SELECT * FROM Appointments WHERE patient_cnic = ? ORDER BY date", ("x",)),
+        ("appointments_by_status", "SELECT * FROM Appointments WHERE status = ? AND date >= ?", ("Scheduled", "2024-01-01")),
+        ("billings_for_patient", "SELECT * FROM Billings WHERE patient_cnic = ?", ("x",)),
+        *_grid_pages("Patients", "id", ("name", "cnic")),
+        *_grid_pages("Doctors", "id", ("name", "department")),
+    ],
+    "front_desk": [
+        ("appointments_in_range", "SELECT doctor FROM Appointments WHERE date BETWEEN ? AND ?", ("2024-01-01", "2024-12-31")),
+        ("appointments_for_doctor", "SELECT * FROM Appointments WHERE doctor = ? ORDER BY date", ("x",)),
+        ("appointments_for_patient", "SELECT * FROM Appointments WHERE patient = ? ORDER BY date", ("x",)),
+        ("appointments_by_status", "SELECT * FROM Appointments WHERE status = ? AND date >= ?", ("Scheduled", "2024-01-01")),
+        *_grid_pages("Patients", "id", ("name", "cnic")),
+        *_grid_pages("Doctors", "id", ("name", "specialty")),
+        *_grid_pages("Appointments", "id", ("date", "doctor", "status")),
+    ],
+    "charts": [
+        ("appointments_in_range", "SELECT * FROM Appointments WHERE app_date BETWEEN ? AND ?", ("2024-01-01", "2024-12-31")),
+        ("appointments_for_doctor", "SELECT * FROM Appointments WHERE doc_id = ? ORDER BY app_date", (1,)),
+        ("appointments_for_patient", "SELECT * FROM Appointments WHERE pat_id = ? ORDER BY app_date", (1,)),
+        ("appointments_by_status", "SELECT * FROM Appointments WHERE status = ? AND app_date >= ?", ("Scheduled", "2024-01-01")),
+        ("billings_for_patient", "SELECT * FROM Billings WHERE pat_id = ? ORDER BY bill_date", (1,)),
+        ("billings_in_range", "SELECT * FROM Billings WHERE bill_date BETWEEN ? AND ?", ("2024-01-01", "2024-12-31")),
+        *_grid_pages("Patients", "pat_id", ("name", "age", "registration_date")),
+    ],
+}
+
+
+def applied_versions(conn, layout):
+    conn.executescript(VERSION_TABLE)
+    rows = conn.execute("SELECT version FROM schema_version WHERE app = ?", (layout.name,))
+    return {version for (version,) in rows}
+
+
+def migrate(conn, layout):
+    """Apply the layout's pending migrations in order; return their names."""
+    done = applied_versions(conn, layout)
+    applied = []
+    for migration in sorted(MIGRATIONS[layout.name], key=lambda m: m.version):
+        if migration.version in done:
+            continue
+        if callable(migration.apply):
+            migration.apply(conn, layout)
+        else:
+            conn.executescript(migration.apply)
+        # Migrations are idempotent, so another process starting on the same
+        # file may have applied and recorded this one meanwhile.
+        with conn:
+            recorded = conn.execute(
+                "INSERT OR IGNORE INTO schema_version VALUES (?, ?, ?, ?)",
+                (layout.name, migration.version, migration.name, datetime.now().isoformat(timespec="seconds")),
+            ).rowcount
+        if recorded:
+            applied.append(migration.name)
+    return applied
+
+
+_bootstrapped = {}  # (db file, layout name) -> schema fingerprint
+_bootstrap_lock = threading.Lock()
+
+
+def fingerprint(conn, layout):
+    """SQLite's schema cookie, bumped by any DDL, plus the chain's latest version."""
+    cookie = conn.execute("PRAGMA schema_version").fetchone()[0]
+    return cookie, max(m.version for m in MIGRATIONS[layout.name])
+
+
+def ensure(db_path, layout):
+    """Migrate ``db_path`` the first time this process sees it, then only re-check.
+
+    Later calls read ``PRAGMA schema_version`` and return straight away
+    unless the schema changed underneath (another process migrated it, a
+    table was dropped, the file was replaced), in which case migrate()
+    runs again.
+    """
+    key = (os.path.abspath(db_path), layout.name)
+    conn = db.connection(db_path)
+    if _bootstrapped.get(key) == fingerprint(conn, layout):
+        return
+    with _bootstrap_lock:
+        if _bootstrapped.get(key) != fingerprint(conn, layout):
+            migrate(conn, layout)
+            _bootstrapped[key] = fingerprint(conn, layout)
+
+
+def full_scans(conn, layout):
+    """Return (query name, plan detail) for every hot query that scans a table."""
+    offenders = []
+    for name, sql, params in HOT_QUERIES[layout.name]:
+        for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params):
+            detail = row[-1]
+            # "SCAN Appointments" is a table scan; index scans read "... USING INDEX ...".
+            if detail.startswith("SCAN ") and " USING " not in detail:
+                offenders.append((name, detail))
+    return offenders
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply migrations or check hot query plans.")
+    parser.add_argument("command", choices=["migrate", "status", "check-plans"])
+    parser.add_argument("--db", default="hospital.db")
+    parser.add_argument("--layout", choices=sorted(LAYOUTS), default="management")
+    args = parser.parse_args(argv)
+
+    conn = db.connection(args.db)
+    layout = LAYOUTS[args.layout]
+    if args.command == "migrate":
+        for name in migrate(conn, layout):
+            print(f"applied {name}")
+        return 0
+    if args.command == "status":
+        done = applied_versions(conn, layout)
+        for migration in sorted(MIGRATIONS[layout.name], key=lambda m: m.version):
+            print(f"[{'x' if migration.version in done else ' '}] {migration.version:03d} {migration.name}")
+        return 0
+
+    migrate(conn, layout)
+    offenders = full_scans(conn, layout)
+    for name, detail in offenders:
+        print(f"FULL SCAN in {name}: {detail}")
+    if not offenders:
+        print(f"All {len(HOT_QUERIES[layout.name])} hot queries use an index")
+    return 1 if offenders else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""Streaming multi-page PDF table reports.
+
+Rows are pulled from a cursor or any iterator one page at a time.  Each
+page gets its own ``Table`` with the header row repeated, drawn straight
+onto the canvas and then dropped, so only one page of rows is held in
+memory however long the report is.  Column widths are fixed from the
+first page and every row has the same height, which lets reportlab skip
+measuring each cell.
+"""
+import io
+from itertools import islice
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+from reportlab.platypus import Table, TableStyle
+
+MARGIN = 36  # points, half an inch
+FONT = "Helvetica"
+FONT_SIZE = 8
+ROW_HEIGHT = 14
+TITLE_HEIGHT = 32
+FOOTER_HEIGHT = 18
+MAX_COLUMN_CHARS = 40
+
+TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#1E88E5")),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+    ('FONTNAME', (0, 0), (-1, 0), "Helvetica-Bold"),
+    ('FONTNAME', (0, 1), (-1, -1), FONT),
+    ('FONTSIZE', (0, 0), (-1, -1), FONT_SIZE),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+])
+
+
+def _text(value, limit):
+    text = "" if value is None else str(value).replace("\n", " ")
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+
+def _column_widths(columns, sample, width):
+    """Split ``width`` between columns by the longest value on the first page."""
+    chars = [
+        min(MAX_COLUMN_CHARS, max([len(name)] + [len(str(row[i])) for row in sample if row[i] is not None]))
+        for i, name in enumerate(columns)
+    ]
+    total = sum(chars) or 1
+    return [width * n / total for n in chars]
+
+
+def write_table(rows, columns, out, title="Report", pagesize=letter):
+    """Render ``rows`` as a paginated table into ``out`` (a path or binary file).
+
+    ``rows`` is any iterable of sequences, e.g. a sqlite3 cursor; it is
+    consumed lazily.  Cells too wide for their column are truncated.
+    Returns the number of rows written.
+    """
+    rows = iter(rows)
+    columns = [str(c) for c in columns]
+    page_width, page_height = pagesize
+    width = page_width - 2 * MARGIN
+    pdf = canvas.Canvas(out, pagesize=pagesize, pageCompression=1)
+    pdf.setTitle(title)
+
+    widths = limits = None
+    written = page = 0
+    while True:
+        top = page_height - MARGIN - (TITLE_HEIGHT if page == 0 else 0)
+        per_page = int((top - MARGIN - FOOTER_HEIGHT) // ROW_HEIGHT) - 1  # minus the header
+        chunk = list(islice(rows, per_page))
+        if not chunk and page:
+            break
+        if widths is None:
+            widths = _column_widths(columns, chunk, width)
+            # Helvetica averages a little over half an em per character.
+            limits = [max(4, int(w / (FONT_SIZE * 0.55))) for w in widths]
+        if page == 0:
+            pdf.setFont("Helvetica-Bold", 16)
+            pdf.drawString(MARGIN, page_height - MARGIN - 18, title)
+
+        data = [columns] + [[_text(value, limit) for value, limit in zip(row, limits)] for row in chunk]
+        table = Table(data, colWidths=widths, rowHeights=ROW_HEIGHT, style=TABLE_STYLE)
+        table.wrapOn(pdf, width, top)
+        table.drawOn(pdf, MARGIN, top - ROW_HEIGHT * len(data))
+
+        page += 1
+        written += len(chunk)
+        pdf.setFont(FONT, FONT_SIZE)
+        pdf.drawRightString(page_width - MARGIN, MARGIN, f"Page {page}")
+        pdf.showPage()
+        if len(chunk) < per_page:
+            break
+    pdf.save()
+    return written
+
+
+def table_pdf(rows, columns, title="Report", pagesize=letter):
+    """write_table() into a BytesIO, rewound for st.download_button."""
+    buffer = io.BytesIO()
+    write_table(rows, columns, buffer, title, pagesize)
+    buffer.seek(0)
+    return buffer
+
+
+def query_pdf(conn, sql, params=(), title="Report", pagesize=letter):
+    """Stream the result of ``sql`` straight from the cursor into a PDF."""
+    cursor = conn.execute(sql, params)
+    columns = [d[0] for d in cursor.description]
+    return table_pdf(cursor, columns, title, pagesize)
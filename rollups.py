@@ -0,0 +1,343 @@
+"""Summary tables kept current by SQLite triggers.
+
+Dashboards read row counts, appointment status counts, monthly revenue and
+appointment trend buckets from these small tables instead of scanning the
+base tables on every rerun.  ``python rollups.py verify`` compares them
+with the base tables and ``python rollups.py rebuild`` recomputes them.
+"""
+import argparse
+import sys
+
+import pandas as pd
+
+import db
+from layouts import LAYOUTS
+
+COUNTED_TABLES = ("Patients", "Doctors", "Appointments", "Billings")
+ROLLUP_TABLES = ("RowCounts", "AppointmentStatusCounts", "MonthlyRevenue",
+                 "AppointmentsDaily", "AppointmentsMonthly")
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS RowCounts(
+        tbl TEXT PRIMARY KEY,
+        n INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE TABLE IF NOT EXISTS AppointmentStatusCounts(
+        status TEXT PRIMARY KEY,
+        n INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE TABLE IF NOT EXISTS MonthlyRevenue(
+        month TEXT PRIMARY KEY,
+        amount REAL NOT NULL DEFAULT 0,
+        bills INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE TABLE IF NOT EXISTS AppointmentsDaily(
+        day TEXT PRIMARY KEY,
+        n INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE TABLE IF NOT EXISTS AppointmentsMonthly(
+        month TEXT,
+        doctor,
+        n INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY(month, doctor)
+    );
+"""
+
+
+def _month(layout, row):
+    # Billings without a date column (App.py) roll up under a single '' month.
+    if layout.billing_date is None:
+        return "''"
+    return f"COALESCE(strftime('%Y-%m', {row}.{layout.billing_date}), '')"
+
+
+def _appointment_keys(layout, row):
+    date = f"{row}.{layout.appointment_date}"
+    return {
+        "day": f"COALESCE(date({date}), '')",
+        "month": f"COALESCE(strftime('%Y-%m', {date}), '')",
+        "doctor": f"COALESCE({row}.{layout.appointment_doctor}, '')",
+    }
+
+
+def _bump(table, keys, delta):
+    """Upsert statement adding ``delta`` to ``table.n`` for the row at ``keys``."""
+    cols = ", ".join(keys)
+    return (
+        f"INSERT INTO {table}({cols}, n) VALUES ({', '.join(keys.values())}, {delta}) "
+        f"ON CONFLICT({cols}) DO UPDATE SET n = n + excluded.n;"
+    )
+
+
+def _bucket_triggers(layout):
+    new, old = _appointment_keys(layout, "NEW"), _appointment_keys(layout, "OLD")
+
+    def bumps(keys, delta):
+        return "\n".join([
+            _bump("AppointmentsDaily", {"day": keys["day"]}, delta),
+            _bump("AppointmentsMonthly", {"month": keys["month"], "doctor": keys["doctor"]}, delta),
+        ])
+
+    cleanup = """
+        DELETE FROM AppointmentsDaily WHERE n <= 0;
+        DELETE FROM AppointmentsMonthly WHERE n <= 0;
+    """
+    return f"""
+        CREATE TRIGGER IF NOT EXISTS rollup_buckets_ins AFTER INSERT ON Appointments BEGIN
+            {bumps(new, 1)}
+        END;
+        CREATE TRIGGER IF NOT EXISTS rollup_buckets_del AFTER DELETE ON Appointments BEGIN
+            {bumps(old, -1)}
+            {cleanup}
+        END;
+        CREATE TRIGGER IF NOT EXISTS rollup_buckets_upd
+        AFTER UPDATE OF {layout.appointment_date}, {layout.appointment_doctor} ON Appointments BEGIN
+            {bumps(old, -1)}
+            {bumps(new, 1)}
+            {cleanup}
+        END;
+    """
+
+
+def _triggers(layout):
+    sql = []
+    for table in COUNTED_TABLES:
+        if not layout.has(table):
+            continue
+        sql.append(f"""
+            CREATE TRIGGER IF NOT EXISTS rollup_{table}_ins AFTER INSERT ON {table} BEGIN
+                INSERT INTO RowCounts(tbl, n) VALUES ('{table}', 1)
+                ON CONFLICT(tbl) DO UPDATE SET n = n + 1;
+            END;
+            CREATE TRIGGER IF NOT EXISTS rollup_{table}_del AFTER DELETE ON {table} BEGIN
+                UPDATE RowCounts SET n = n - 1 WHERE tbl = '{table}';
+            END;
+        """)
+
+    sql.append("""
+        CREATE TRIGGER IF NOT EXISTS rollup_status_ins AFTER INSERT ON Appointments BEGIN
+            INSERT INTO AppointmentStatusCounts(status, n) VALUES (COALESCE(NEW.status, ''), 1)
+            ON CONFLICT(status) DO UPDATE SET n = n + 1;
+        END;
+        CREATE TRIGGER IF NOT EXISTS rollup_status_del AFTER DELETE ON Appointments BEGIN
+            UPDATE AppointmentStatusCounts SET n = n - 1 WHERE status = COALESCE(OLD.status, '');
+            DELETE FROM AppointmentStatusCounts WHERE n <= 0;
+        END;
+        CREATE TRIGGER IF NOT EXISTS rollup_status_upd AFTER UPDATE OF status ON Appointments
+        WHEN COALESCE(OLD.status, '') <> COALESCE(NEW.status, '') BEGIN
+            UPDATE AppointmentStatusCounts SET n = n - 1 WHERE status = COALESCE(OLD.status, '');
+            INSERT INTO AppointmentStatusCounts(status, n) VALUES (COALESCE(NEW.status, ''), 1)
+            ON CONFLICT(status) DO UPDATE SET n = n + 1;
+            DELETE FROM AppointmentStatusCounts WHERE n <= 0;
+        END;
+    """)
+    sql.append(_bucket_triggers(layout))
+
+    if layout.has("Billings"):
+        new_month, old_month = _month(layout, "NEW"), _month(layout, "OLD")
+        watched = "amount" if layout.billing_date is None else f"amount, {layout.billing_date}"
+        sql.append(f"""
+            CREATE TRIGGER IF NOT EXISTS rollup_revenue_ins AFTER INSERT ON Billings BEGIN
+                INSERT INTO MonthlyRevenue(month, amount, bills)
+                VALUES ({new_month}, COALESCE(NEW.amount, 0), 1)
+                ON CONFLICT(month) DO UPDATE SET amount = amount + excluded.amount, bills = bills + 1;
+            END;
+            CREATE TRIGGER IF NOT EXISTS rollup_revenue_del AFTER DELETE ON Billings BEGIN
+                UPDATE MonthlyRevenue SET amount = amount - COALESCE(OLD.amount, 0), bills = bills - 1
+                WHERE month = {old_month};
+                DELETE FROM MonthlyRevenue WHERE bills <= 0;
+            END;
+            CREATE TRIGGER IF NOT EXISTS rollup_revenue_upd AFTER UPDATE OF {watched} ON Billings BEGIN
+                UPDATE MonthlyRevenue SET amount = amount - COALESCE(OLD.amount, 0), bills = bills - 1
+                WHERE month = {old_month};
+                INSERT INTO MonthlyRevenue(month, amount, bills)
+                VALUES ({new_month}, COALESCE(NEW.amount, 0), 1)
+                ON CONFLICT(month) DO UPDATE SET amount = amount + excluded.amount, bills = bills + 1;
+                DELETE FROM MonthlyRevenue WHERE bills <= 0;
+            END;
+        """)
+    return "".join(sql)
+
+
+def _expected(conn, layout):
+    """Recompute every rollup from the base tables.
+
+    Returns {rollup table: (key columns, {key tuple: value tuple})}.
+    """
+    def grouped(sql, nkeys):
+        return {row[:nkeys]: row[nkeys:] for row in conn.execute(sql)}
+
+    counts = {
+        (table,): (conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0],)
+        for table in COUNTED_TABLES if layout.has(table)
+    }
+    keys = _appointment_keys(layout, "Appointments")
+    expected = {
+        "RowCounts": (("tbl",), counts),
+        "AppointmentStatusCounts": (("status",), grouped(
+            "SELECT COALESCE(status, ''), COUNT(*) FROM Appointments GROUP BY 1", 1)),
+        "AppointmentsDaily": (("day",), grouped(
+            f"SELECT {keys['day']}, COUNT(*) FROM Appointments GROUP BY 1", 1)),
+        "AppointmentsMonthly": (("month", "doctor"), grouped(
+            f"SELECT {keys['month']}, {keys['doctor']}, COUNT(*) FROM Appointments GROUP BY 1, 2", 2)),
+        "MonthlyRevenue": (("month",), {}),
+    }
+    if layout.has("Billings"):
+        expected["MonthlyRevenue"] = (("month",), grouped(
+            f"SELECT {_month(layout, 'Billings')}, COALESCE(SUM(amount), 0), COUNT(*) "
+            "FROM Billings GROUP BY 1", 1))
+    return expected
+
+
+def install(conn, layout):
+    """Create the rollup tables and triggers, filling new ones from the base tables."""
+    existing = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    conn.executescript(SCHEMA + _triggers(layout))
+    if not existing.issuperset(ROLLUP_TABLES):
+        rebuild(conn, layout)
+
+
+def rebuild(conn, layout):
+    expected = _expected(conn, layout)
+    with conn:
+        for table, (_, rows) in expected.items():
+            conn.execute(f"DELETE FROM {table}")
+            if rows:
+                width = len(next(iter(rows))) + len(next(iter(rows.values())))
+                conn.executemany(
+                    f"INSERT INTO {table} VALUES ({', '.join('?' * width)})",
+                    [key + value for key, value in rows.items()],
+                )
+
+
+def _same(have, want):
+    return all(
+        abs(h - w) <= 0.005 if isinstance(h, float) or isinstance(w, float) else h == w
+        for h, w in zip(have, want)
+    )
+
+
+def verify(conn, layout):
+    """Return a list of (rollup, key, stored, expected) rows that have drifted."""
+    drift = []
+    for table, (key_cols, want) in _expected(conn, layout).items():
+        nkeys = len(key_cols)
+        have = {row[:nkeys]: row[nkeys:] for row in conn.execute(f"SELECT * FROM {table}")}
+        if table == "RowCounts":
+            have = {key: value for key, value in have.items() if key in want}
+        for key in set(have) | set(want):
+            zero = (0,) * len(have.get(key) or want.get(key))
+            stored, expected = have.get(key, zero), want.get(key, zero)
+            if not _same(stored, expected):
+                drift.append((table, key if nkeys > 1 else key[0], stored, expected))
+    return drift
+
+
+# ================= READERS =================
+def row_counts(conn):
+    return dict(conn.execute("SELECT tbl, n FROM RowCounts").fetchall())
+
+
+def status_counts(conn):
+    """Appointments per status, largest first, indexed by status."""
+    return pd.read_sql(
+        "SELECT status, n AS Count FROM AppointmentStatusCounts "
+        "WHERE n > 0 AND status <> '' ORDER BY n DESC",
+        conn,
+    ).set_index("status")
+
+
+def monthly_revenue(conn):
+    """Revenue per 'YYYY-MM' month, oldest first, indexed by month."""
+    return pd.read_sql(
+        "SELECT month, amount FROM MonthlyRevenue WHERE month <> '' ORDER BY month",
+        conn,
+    ).set_index("month")
+
+
+def appointment_years(conn):
+    """Years that have at least one dated appointment, ascending."""
+    rows = conn.execute(
+        "SELECT DISTINCT CAST(substr(month, 1, 4) AS INTEGER) FROM AppointmentsMonthly "
+        "WHERE month <> '' ORDER BY 1"
+    ).fetchall()
+    return [year for (year,) in rows]
+
+
+def appointments_by_month(conn, year=None, doctor=None):
+    """Appointments per 'YYYY-MM' month (columns month, Appointments), oldest first."""
+    sql = "SELECT month, SUM(n) AS Appointments FROM AppointmentsMonthly WHERE month <> ''"
+    params = []
+    if year is not None:
+        sql += " AND month BETWEEN ? AND ?"
+        params += [f"{int(year):04d}-01", f"{int(year):04d}-12"]
+    if doctor is not None:
+        sql += " AND doctor = ?"
+        params.append(doctor)
+    return pd.read_sql(sql + " GROUP BY month ORDER BY month", conn, params=params)
+
+
+def appointments_by_day(conn, start=None, end=None):
+    """Appointments per 'YYYY-MM-DD' day (columns day, Appointments) in [start, end]."""
+    sql = "SELECT day, n AS Appointments FROM AppointmentsDaily WHERE day <> ''"
+    params = []
+    if start is not None:
+        sql += " AND day >= ?"
+        params.append(str(start))
+    if end is not None:
+        sql += " AND day <= ?"
+        params.append(str(end))
+    return pd.read_sql(sql + " ORDER BY day", conn, params=params)
+
+
+def appointments_by_doctor(conn, year=None, top=None):
+    """Appointments per doctor (columns doctor, Appointments), busiest first.
+
+    With ``top``, only the ``top`` busiest doctors are listed and the rest
+    are summed into a final "Other" row, so the result stays small however
+    many doctors there are.
+    """
+    where, params = "", []
+    if year is not None:
+        where = " WHERE month BETWEEN ? AND ?"
+        params += [f"{int(year):04d}-01", f"{int(year):04d}-12"]
+    if top is None:
+        sql = f"SELECT doctor, SUM(n) AS Appointments FROM AppointmentsMonthly{where} GROUP BY doctor ORDER BY Appointments DESC"
+        return pd.read_sql(sql, conn, params=params)
+    sql = f"""
+        WITH per_doctor AS (
+            SELECT doctor, SUM(n) AS n FROM AppointmentsMonthly{where} GROUP BY doctor
+        ), ranked AS (
+            SELECT doctor, n, ROW_NUMBER() OVER (ORDER BY n DESC, doctor) AS rank FROM per_doctor
+        )
+        SELECT CASE WHEN rank <= ? THEN doctor ELSE 'Other' END AS doctor, SUM(n) AS Appointments
+        FROM ranked
+        GROUP BY rank <= ?, CASE WHEN rank <= ? THEN rank END
+        ORDER BY MIN(rank)
+    """
+    return pd.read_sql(sql, conn, params=params + [int(top)] * 3)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verify or rebuild the dashboard rollup tables.")
+    parser.add_argument("command", choices=["verify", "rebuild"])
+    parser.add_argument("--db", default="hospital.db")
+    parser.add_argument("--layout", choices=sorted(LAYOUTS), default="management")
+    args = parser.parse_args(argv)
+
+    conn = db.connection(args.db)
+    layout = LAYOUTS[args.layout]
+    install(conn, layout)
+    drift = verify(conn, layout)
+    for rollup, key, have, want in drift:
+        print(f"{rollup}[{key!r}]: stored {have}, expected {want}")
+    if args.command == "rebuild":
+        rebuild(conn, layout)
+        print(f"Rebuilt rollups ({len(drift)} drifted rows fixed)")
+        return 0
+    print("Rollups match base tables" if not drift else f"{len(drift)} drifted rows")
+    return 1 if drift else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""Appointment slips for the front desk (app.py).
+
+Slips are rendered into memory and kept in a bounded LRU keyed by the
+appointment id and a hash of its row, so downloading the same slip again
+costs nothing and editing the appointment changes the key.  batch_pdf()
+prints a whole day (or range, or doctor) as one PDF, a slip per page.
+"""
+import hashlib
+import io
+import json
+
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate
+
+import cache
+
+SLIP_COLUMNS = "id, patient, doctor, date, time, status"
+SLIP_SQL = f"SELECT {SLIP_COLUMNS} FROM Appointments WHERE id = ?"
+CACHE_SIZE = 512  # slips are ~2 KB each
+
+_slips = cache.LRUCache(CACHE_SIZE)
+_styles = getSampleStyleSheet()  # built once; every slip and batch shares them
+
+
+def row_version(row):
+    """Hash of everything printed on the slip."""
+    payload = json.dumps(row, sort_keys=True, default=str).encode()
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+def _flowables(row):
+    title, normal = _styles["Title"], _styles["Normal"]
+    return [
+        Paragraph("<b>Appointment Slip</b>", title),
+        Paragraph(f"Patient: {row['patient']}", normal),
+        Paragraph(f"Doctor: {row['doctor']}", normal),
+        Paragraph(f"Date: {row['date']}", normal),
+        Paragraph(f"Time: {row['time']}", normal),
+        Paragraph(f"Status: {row['status']}", normal),
+    ]
+
+
+def render(row):
+    """PDF bytes of the slip for one appointment row (a mapping or sqlite3.Row)."""
+    buffer = io.BytesIO()
+    SimpleDocTemplate(buffer).build(_flowables(row))
+    return buffer.getvalue()
+
+
+def slip_pdf(conn, appointment_id):
+    """Slip for ``appointment_id`` from the cache or freshly rendered; None if missing."""
+    cursor = conn.execute(SLIP_SQL, (appointment_id,))
+    values = cursor.fetchone()
+    if values is None:
+        return None
+    row = dict(zip([d[0] for d in cursor.description], values))
+    key = (appointment_id, row_version(row))
+    hit, pdf = _slips.get(key)
+    if not hit:
+        pdf = render(row)
+        _slips.put(key, pdf)
+    return pdf
+
+
+def batch_pdf(conn, start=None, end=None, doctor=None):
+    """One PDF with a slip per page for every appointment in the range/for the doctor.
+
+    ``start`` and ``end`` are inclusive ISO dates; any filter may be None.
+    The appointments come from a single query in date and time order.
+    Returns None when nothing matches.
+    """
+    where, params = [], []
+    if start:
+        where.append("date >= ?")
+        params.append(str(start))
+    if end:
+        where.append("date <= ?")
+        params.append(str(end))
+    if doctor:
+        where.append("doctor = ?")
+        params.append(doctor)
+    sql = f"SELECT {SLIP_COLUMNS} FROM Appointments"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    cursor = conn.execute(sql + " ORDER BY date, time, id", params)
+    columns = [d[0] for d in cursor.description]
+
+    story = []
+    for values in cursor:
+        if story:
+            story.append(PageBreak())
+        story.extend(_flowables(dict(zip(columns, values))))
+    if not story:
+        return None
+    buffer = io.BytesIO()
+    SimpleDocTemplate(buffer).build(story)
+    return buffer.getvalue()
+
+
+def stats():
+    return {"hits": _slips.hits, "misses": _slips.misses, "entries": len(_slips._entries)}
@@ -0,0 +1,229 @@
+"""Parquet snapshots of the database for offline analytics.
+
+Each table is streamed out of SQLite in chunks into ``<out>/<Table>/``.
+Appointments and dated Billings are partitioned Hive-style by the month
+of their date (``year=2024/month=05/part-0.parquet``); rows whose date is
+missing or not ISO go to the ``__HIVE_DEFAULT_PARTITION__`` partition.
+Other tables are written as a single file.  Users is never exported.
+
+The high-water mark is the ``ChangeLog`` position (see changes.py) saved
+in ``<out>/_snapshot.json``.  A later run reads the log past it and
+rewrites only the partitions holding changed rows: new appointments
+touch the current month, an edited one its old and new months.  When the
+log has been pruned past the mark, everything is exported again.
+
+    python snapshots.py exports/ --db hospital.db --layout charts
+"""
+import argparse
+import glob
+import json
+import os
+import shutil
+import sys
+import time
+from typing import NamedTuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+import changes
+import db
+from layouts import LAYOUTS
+
+CHUNK_ROWS = 50_000  # rows per fetch, and per Parquet row group
+COMPRESSION = "zstd"
+STATE_FILE = "_snapshot.json"
+EXCLUDED = ("Users",)  # credentials
+DEFAULT_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+_TYPES = {"INTEGER": pa.int64(), "REAL": pa.float64()}
+
+
+class SnapshotReport(NamedTuple):
+    table: str
+    partitions: int  # files rewritten
+    rows: int
+    seconds: float
+
+
+def _month_sql(column):
+    """SQL for the 'YYYY-MM' partition of ``column``, NULL unless it starts with one."""
+    return f"CASE WHEN {column} GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]*' THEN substr({column}, 1, 7) END"
+
+
+def _partition_column(layout, table):
+    return {"Appointments": layout.appointment_date, "Billings": layout.billing_date}.get(table)
+
+
+def _partition_dir(month):
+    if month is None:
+        return f"year={DEFAULT_PARTITION}/month={DEFAULT_PARTITION}"
+    return f"year={month[:4]}/month={month[5:7]}"
+
+
+def _month_of(path):
+    """Inverse of _partition_dir for a file path inside the partition."""
+    year, month = (part.split("=", 1)[1] for part in path.split(os.sep)[-3:-1])
+    return None if year == DEFAULT_PARTITION else f"{year}-{month}"
+
+
+def _schema(conn, table):
+    columns = conn.execute(f"PRAGMA table_info({table})").fetchall()
+    return pa.schema([(name, _TYPES.get(decl.upper(), pa.string())) for _, name, decl, *_ in columns])
+
+
+def _write(conn, sql, params, schema, path, compression, keep_empty=False):
+    """Stream the rows of ``sql`` into the Parquet file ``path``; returns the row count.
+
+    The file is written next to ``path`` and renamed over it.  When no
+    rows match it is removed, with its empty partition directories,
+    unless ``keep_empty``.
+    """
+    cursor = conn.execute(sql, params)
+    tmp = path + ".tmp"
+    writer, rows = None, 0
+    try:
+        while True:
+            chunk = cursor.fetchmany(CHUNK_ROWS)
+            if not chunk:
+                break
+            columns = list(zip(*chunk))
+            batch = pa.RecordBatch.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema)
+            if writer is None:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                writer = pq.ParquetWriter(tmp, schema, compression=compression)
+            writer.write_batch(batch)
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None and keep_empty:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        pq.write_table(schema.empty_table(), tmp, compression=compression)
+    if writer is not None or keep_empty:
+        os.replace(tmp, path)
+    elif os.path.exists(path):
+        os.remove(path)
+        directory = os.path.dirname(path)
+        while directory and not os.listdir(directory):
+            os.rmdir(directory)
+            directory = os.path.dirname(directory)
+    return rows
+
+
+def _write_partition(conn, table, column, month, schema, table_dir, compression):
+    path = os.path.join(table_dir, _partition_dir(month), "part-0.parquet")
+    if month is None:
+        sql, params = f"SELECT * FROM {table} WHERE {_month_sql(column)} IS NULL", ()
+    else:
+        # The range uses the date index; the prefix check keeps it exact.
+        sql = f"SELECT * FROM {table} WHERE {column} >= ? AND {column} < ? AND {_month_sql(column)} = ?"
+        params = (month, month + "\U0010ffff", month)
+    return _write(conn, sql + " ORDER BY " + column, params, schema, path, compression)
+
+
+def _stored_months(table_dir, pk, row_ids):
+    """Partitions of the existing snapshot that hold any of ``row_ids``."""
+    wanted = pa.array(list(row_ids))
+    months = set()
+    for path in glob.glob(os.path.join(table_dir, "year=*", "month=*", "*.parquet")):
+        ids = pq.read_table(path, columns=[pk])[pk]
+        if pc.any(pc.is_in(ids, value_set=wanted.cast(ids.type))).as_py():
+            months.add(_month_of(path))
+    return months
+
+
+def export_table(conn, layout, table, out_dir, row_ids=None, compression=COMPRESSION, edited=()):
+    """Write ``table`` (all of it, or the partitions of ``row_ids``) under ``out_dir``.
+
+    Only the ``edited`` ids (updated or deleted ones) are looked up in the
+    stored partitions; an inserted row is in none of them yet.
+    """
+    started = time.perf_counter()
+    schema = _schema(conn, table)
+    table_dir = os.path.join(out_dir, table)
+    column = _partition_column(layout, table)
+    if column is None:
+        rows = _write(conn, f"SELECT * FROM {table}", (), schema,
+                      os.path.join(table_dir, "part-0.parquet"), compression, keep_empty=True)
+        return SnapshotReport(table, 1, rows, time.perf_counter() - started)
+
+    if row_ids is None:
+        shutil.rmtree(table_dir, ignore_errors=True)
+        months = {month for (month,) in conn.execute(f"SELECT DISTINCT {_month_sql(column)} FROM {table}")}
+    else:
+        pk = layout.primary_keys[table]
+        current = conn.execute(
+            f"SELECT DISTINCT {_month_sql(column)} FROM {table} "
+            f"WHERE {pk} IN (SELECT value FROM json_each(?))",
+            (json.dumps(list(row_ids)),),
+        )
+        months = {month for (month,) in current}
+        if edited:
+            months |= _stored_months(table_dir, pk, edited)
+    rows = sum(_write_partition(conn, table, column, month, schema, table_dir, compression)
+               for month in sorted(months, key=lambda month: month or ""))
+    return SnapshotReport(table, len(months), rows, time.perf_counter() - started)
+
+
+def _load_state(out_dir):
+    try:
+        with open(os.path.join(out_dir, STATE_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_state(out_dir, state):
+    path = os.path.join(out_dir, STATE_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def export(db_path, layout, out_dir, full=False, compression=COMPRESSION):
+    """Bring the snapshot in ``out_dir`` up to date; returns a SnapshotReport per table written."""
+    conn = db.connection(db_path)
+    tables = [table for table in layout.tables if table not in EXCLUDED]
+    state = _load_state(out_dir)
+    source = {"db": os.path.abspath(db_path), "layout": layout.name}
+    watermark = state.get("seq") if not full and state.get("source") == source else None
+    # Read before exporting: rows changed meanwhile are exported again next time.
+    ok, top = changes.replayable(conn, watermark)
+
+    os.makedirs(out_dir, exist_ok=True)
+    if not ok:
+        reports = [export_table(conn, layout, table, out_dir, compression=compression) for table in tables]
+    else:
+        changed, edited = {}, {}
+        for _, table, op, row_id, _ in changes.changes_since(conn, watermark):
+            changed.setdefault(table, set()).add(row_id)
+            if op != "INSERT":
+                edited.setdefault(table, set()).add(row_id)
+        reports = [export_table(conn, layout, table, out_dir, changed[table], compression, edited.get(table, ()))
+                   for table in tables if table in changed]
+    _save_state(out_dir, {"source": source, "seq": top, "exported_at": time.strftime("%Y-%m-%d %H:%M:%S")})
+    return reports
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the database as a partitioned Parquet snapshot.")
+    parser.add_argument("out", help="snapshot directory")
+    parser.add_argument("--db", default="hospital.db")
+    parser.add_argument("--layout", choices=sorted(LAYOUTS), default="management")
+    parser.add_argument("--full", action="store_true", help="rewrite everything, ignoring the high-water mark")
+    parser.add_argument("--compression", default=COMPRESSION, help="Parquet codec (zstd, snappy, gzip, none)")
+    args = parser.parse_args(argv)
+
+    reports = export(args.db, LAYOUTS[args.layout], args.out, args.full, args.compression)
+    for report in reports:
+        print(f"{report.table}: {report.rows} rows in {report.partitions} files, {report.seconds:.2f}s")
+    if not reports:
+        print("Snapshot is up to date")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
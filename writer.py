@@ -0,0 +1,184 @@
+"""Single writer thread that batches database writes from every session.
+
+Streamlit sessions hand their INSERT/UPDATE/DELETE statements to
+``submit()``, which returns a ``concurrent.futures.Future``.  One thread
+per database file drains the queue and applies everything that arrived
+within a tick in a single transaction, so a burst of form submissions
+costs one commit instead of one per write.  Each statement runs inside
+its own SAVEPOINT: a failing statement (say, a duplicate CNIC raising
+``sqlite3.IntegrityError``) fails only its own future.
+"""
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import db
+
+TICK_SECONDS = 0.005
+MAX_BATCH = 500
+
+_STOP = object()
+
+
+class WriteQueue:
+    def __init__(self, path, tick=TICK_SECONDS, max_batch=MAX_BATCH):
+        self.path = path
+        self.tick = tick
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._latencies = deque(maxlen=1000)  # seconds per commit
+        self._batch_sizes = deque(maxlen=1000)
+        self._lock = threading.Lock()
+        self.commits = self.writes = self.failures = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=f"db-writer:{path}", daemon=True)
+        self._thread.start()
+
+    def submit(self, sql, params=()):
+        """Queue one statement; the future resolves to its lastrowid once committed."""
+        if self._closed:
+            raise sqlite3.ProgrammingError(f"write queue for {self.path} is closed")
+        future = Future()
+        self._queue.put((sql, tuple(params), False, future))
+        return future
+
+    def submit_many(self, sql, rows):
+        """Queue an executemany() over ``rows``; resolves to the number of rows changed."""
+        if self._closed:
+            raise sqlite3.ProgrammingError(f"write queue for {self.path} is closed")
+        future = Future()
+        self._queue.put((sql, rows, True, future))
+        return future
+
+    def execute(self, sql, params=()):
+        """submit() and wait for the commit, re-raising the statement's error."""
+        return self.submit(sql, params).result()
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is _STOP:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.tick
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            try:
+                # After the tick, still take whatever is already waiting.
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._queue.put(_STOP)  # finish this batch, then stop
+                break
+            batch.append(item)
+        return batch
+
+    def _apply(self, conn, batch):
+        done = []
+        started = time.perf_counter()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for sql, params, many, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                conn.execute("SAVEPOINT write")
+                try:
+                    if many:
+                        result = conn.executemany(sql, params).rowcount
+                    else:
+                        result = conn.execute(sql, params).lastrowid
+                except sqlite3.Error as exc:
+                    conn.execute("ROLLBACK TO write")
+                    conn.execute("RELEASE write")
+                    future.set_exception(exc)
+                    with self._lock:
+                        self.failures += 1
+                    continue
+                conn.execute("RELEASE write")
+                done.append((future, result))
+            conn.execute("COMMIT")
+        except Exception as exc:  # noqa: BLE001 - must not kill the writer thread
+            if conn.in_transaction:
+                conn.rollback()
+            # The whole transaction is gone: fail every write still waiting.
+            pending = [future for *_, future in batch if not future.done()]
+            for future in pending:
+                future.set_exception(exc)
+            with self._lock:
+                self.failures += len(pending)
+            return
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.commits += 1
+            self.writes += len(done)
+            self._latencies.append(elapsed)
+            self._batch_sizes.append(len(batch))
+        for future, result in done:
+            future.set_result(result)
+
+    def _run(self):
+        conn = db.get_pool(self.path).connection()
+        while True:
+            batch = self._collect()
+            if batch is None:
+                break
+            self._apply(conn, batch)
+
+    def metrics(self):
+        """Queue depth, throughput counters and commit latency (ms) stats."""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            sizes = list(self._batch_sizes)
+            result = {
+                "queue_depth": self._queue.qsize(),
+                "commits": self.commits,
+                "writes": self.writes,
+                "failures": self.failures,
+            }
+        if latencies:
+            result.update(
+                commit_ms_avg=1000 * sum(latencies) / len(latencies),
+                commit_ms_p95=1000 * latencies[int(0.95 * (len(latencies) - 1))],
+                commit_ms_max=1000 * latencies[-1],
+                batch_avg=sum(sizes) / len(sizes),
+            )
+        return result
+
+    def close(self, timeout=None):
+        """Stop accepting writes, flush what is queued and stop the thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_writer(path):
+    """Return the process-wide write queue for ``path``, starting it on first use."""
+    key = os.path.abspath(path)
+    with _writers_lock:
+        writer = _writers.get(key)
+        if writer is None or writer._closed:
+            writer = _writers[key] = WriteQueue(path)
+        return writer
+
+
+def close_all():
+    with _writers_lock:
+        writers = list(_writers.values())
+        _writers.clear()
+    for writer in writers:
+        writer.close()
+
+
+# Registered after db's handler, so it runs first and flushes before pools close.
+atexit.register(close_all)